@@ -10,7 +10,8 @@ setuptools.setup(name='sgoal',
       author_email='jgomezpe@unal.edu.co',
       url='https://github.com/jgomezpe/sgoal',
       packages=setuptools.find_packages(),
-      install_requires=[],
+      install_requires=['numpy'],
+      extras_require={'maxcut': ['pandas']},
       license='MIT License',
       zip_safe=False,
       keywords='sgoal package',
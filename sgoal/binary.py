@@ -18,8 +18,13 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 import random as rand
+import numpy as np
+from functools import partial
 from sgoal.core import SPACE
 from sgoal.core import PROBLEM
+from sgoal.core import rec
+from sgoal.core import recmutable
+from sgoal.core import refresh
 from sgoal.core import randbool
 from sgoal.core import VRSGoal
 from sgoal.core import variation11
@@ -32,6 +37,7 @@ from sgoal.chavela import apply
 from sgoal.chavela import CHAVELA_T
 from sgoal.chavela import CHAVELA1_T
 from sgoal.util import powerlaw
+from sgoal.util import randindices
 
 # Fixed Length Binary Space
 # D : Length of the BitArray (Binary string)
@@ -39,6 +45,7 @@ def Binary(D):
   space = SPACE( lambda: [1 if randbool() else 0 for i in range(D)] )
   space['D'] = D
   space['complement'] = complement
+  space['dtype'] = bool
   return space
 
 ############### VARIATION OPERATIONS ################
@@ -49,7 +56,9 @@ def flip(x, k):
   return y
 
 # Generates the complement BitArray by flipping each bit (creates a new one - hard copy)
-def complement(x): return [1 if v==0 else 0 for v in x]
+def complement(x): 
+  if(isinstance(x, np.ndarray)): return (x == 0).astype(x.dtype)
+  return [1 if v==0 else 0 for v in x]
 
 # Single bit mutation: Flips a single bit chosen in a random fashion (creates a new one - hard copy)
 def singlebitmutation(x):
@@ -63,25 +72,106 @@ def multiflip(x, k):
     y[i] = 1 if y[i]==0 else 0
   return y
 
-# Bit mutation. Flips each bit with probability p (creates a new one - hard copy)
-def bitmutationprob(x, p):
+# Bit mutation. Flips each bit with probability p (creates a new one - hard copy). Returns the mutated BitArray and 
+# the indices of the flipped bits. The flipped bits are drawn directly (see randindices) so it runs in O(p|x|) 
+# random numbers instead of O(|x|)
+def bitmutationflips(x, p):
+  k = randindices(len(x), p)
   y = x.copy()
-  for i in range(len(y)):
-    if( randbool(p) ): 
-      y[i] = 1 - y[i]
-  return y
+  for i in k:
+    y[i] = 1 - y[i]
+  return y, k
 
-def powerlawmutation(x):
-  return bitmutationprob(x, 0.005+(powerlaw()-1)/len(x))
+# Bit mutation. Flips each bit with probability p (creates a new one - hard copy)
+def bitmutationprob(x, p): return bitmutationflips(x, p)[0]
+
+# Power law bit mutation. Returns the mutated BitArray and the indices of the flipped bits
+def powerlawmutationflips(x): return bitmutationflips(x, 0.005+(powerlaw()-1)/len(x))
+
+def powerlawmutation(x): return powerlawmutationflips(x)[0]
 
 # Bit mutation. Flips a bit with probability 1/|x| (creates a new one - hard copy)
 def bitmutation(x): return bitmutationprob(x, 1.0/len(x))
 
+############### PACKED BINARY SPACE ################
+# A BitArray of length D packed in a Python int (a bitset): The k-th bit of the BitArray is the k-th bit of the int.
+# Packed BitArrays are immutable so variation operations do not copy the BitArray.
+# D : Length of the BitArray (Binary string)
+def PackedBinary(D):
+  space = SPACE( lambda: rand.getrandbits(D) )
+  space['D'] = D
+  space['packed'] = True
+  space['dtype'] = object
+  space['complement'] = lambda x: pcomplement(x, D)
+  return space
+
+# Determines if the problem uses packed BitArrays
+def ispacked(problem): return 'packed' in problem and problem['packed']
+
+# Packs a BitArray (list of 0/1 values) as an int
+def pack(x):
+  return int.from_bytes(np.packbits(np.asarray(x, dtype=np.uint8), bitorder='little').tobytes(), 'little')
+
+# Unpacks a packed BitArray of length D as a list of 0/1 values
+def unpack(x, D):
+  b = np.frombuffer(x.to_bytes((D+7)//8, 'little'), dtype=np.uint8)
+  return np.unpackbits(b, bitorder='little')[:D].tolist()
+
+# Wraps a function on BitArrays (lists) as a function on packed BitArrays of length D
+def unpacked(f, D): return lambda x: f(unpack(x, D))
+
+# Flips the kth bit of a packed BitArray
+def pflip(x, k): return x ^ (1 << k)
+
+# Generates the complement of a packed BitArray of length D
+def pcomplement(x, D): return x ^ ((1 << D) - 1)
+
+# Single bit mutation of a packed BitArray of length D
+def psinglebitmutation(x, D): return x ^ (1 << rand.randint(0,D-1))
+
+# Flips the set of bits in the indices array k of a packed BitArray of length D (all the bits if k is empty)
+def pmultiflip(x, k, D):
+  if(len(k)==0): return pcomplement(x, D)
+  m = 0
+  for i in k: m |= 1 << i
+  return x ^ m
+
+# Bit mutation of a packed BitArray of length D. Flips each bit with probability p
+def pbitmutationprob(x, D, p):
+  m = 0
+  for i in randindices(D, p): m |= 1 << i
+  return x ^ m
+
+def ppowerlawmutation(x, D):
+  return pbitmutationprob(x, D, 0.005+(powerlaw()-1)/D)
+
+# Bit mutation of a packed BitArray of length D. Flips a bit with probability 1/D
+def pbitmutation(x, D): return pbitmutationprob(x, D, 1.0/D)
+
+# Simple crossover of packed BitArrays of length D
+def psimplexover(x1, x2, D):
+  low = (1 << rand.randint(1,D-1)) - 1
+  high = ((1 << D) - 1) ^ low
+  return (x1 & low) | (x2 & high), (x2 & low) | (x1 & high)
+
+# Transposition of a packed BitArray of length D (reverses the bits between two random positions)
+def ptransposition(x, D):
+  start = rand.randint(0,D-1)
+  end = rand.randint(0,D-1)
+  if start>end: start, end = end, start
+  L = end - start + 1
+  m = (1 << L) - 1
+  seg = int(format((x >> start) & m, '0%db' % L)[::-1], 2)
+  return (x & ~(m << start)) | (seg << start)
+
 ##################### SGOALs ###########################
 # Classical Hill Climbing Algorithm with neutral mutation for BitArray problems. Uses bitmutation as variation operator
 # problem: Problem to solve
 def HC(problem): 
-  if( 'variation' not in problem ): problem['variation'] = bitmutation 
+  if( 'variation' not in problem ): 
+    if(ispacked(problem)): problem['variation'] = lambda x: pbitmutation(x, problem['D'])
+    elif(isdelta(problem)): problem['variation'] = lambda x, fx: dbitmutation(x, fx, problem)
+    else: problem['variation'] = bitmutation 
   return VRSGoal(problem)
 
 # The HC algorithm suggested by Richard Palmer, that Forrest and
@@ -90,13 +180,19 @@ def HC(problem):
 # Santa Fe Institute, Working Papers, 01 1993.
 # problem: Problem to solve
 def RMHC(problem): 
-  if('variation' not in problem): problem['variation'] = singlebitmutation 
+  if('variation' not in problem): 
+    if(ispacked(problem)): problem['variation'] = lambda x: psinglebitmutation(x, problem['D'])
+    elif(isdelta(problem)): problem['variation'] = lambda x, fx: dsinglebitmutation(x, fx, problem)
+    else: problem['variation'] = singlebitmutation 
   return VRSGoal(problem)
 
 # 1+1 Evolutionary Strategy (Hill Climbing) with neutral mutations and 1/5th rule, for BitArray
 # problem: Problem to solve
 def setprob(problem):
-  problem['variation'] = lambda x, fx: variation11(x, fx, lambda y: bitmutationprob(y, problem['parameter']), problem)
+  if(ispacked(problem)): 
+    D = problem['D']
+    problem['variation'] = lambda x, fx: variation11(x, fx, lambda y: pbitmutationprob(y, D, problem['parameter']), problem)
+  else: problem['variation'] = lambda x, fx: variation11(x, fx, lambda y: bitmutationprob(y, problem['parameter']), problem)
   
 # 1+1 Evolutionary Strategy (Hill Climbing) with neutral mutations and 1/5th rule, see
 # Beyer, Hans-Georg & Schwefel, Hans-Paul. (2002). Evolution strategies - A comprehensive introduction. 
@@ -112,6 +208,10 @@ def Rule1_5(problem):
 
 ############### Generational Genetic Algorithm - SSGA ################
 def bmutation(sgoal):
+  if(ispacked(sgoal)):
+    D = sgoal['D']
+    if('mutation' not in sgoal): sgoal['mutation'] = lambda x: pbitmutation(x, D)
+    if('xover' not in sgoal): sgoal['xover'] = lambda x1, x2: psimplexover(x1, x2, D)
   if('mutation' not in sgoal): sgoal['mutation'] = bitmutation
   return sgoal
 
@@ -125,15 +225,22 @@ def SSGA(problem):
 
 # Standard CHAVELA for Binary problems. Uses bitmutation, simplexover, and transposition as operators
 def CHAVELA(problem):
-  mutation = lambda x, fx: apply(bitmutation, x, fx, problem)
-  xover = lambda x, fx: apply(simplexover, x, fx, problem)
-  transp = lambda x, fx: apply(transposition, x, fx, problem)
-  if( 'operators' not in problem ): problem['operators'] = [mutation, xover, transp]
+  if(ispacked(problem)):
+    D = problem['D']
+    variations = [partial(pbitmutation, D=D), partial(psimplexover, D=D), partial(ptransposition, D=D)]
+  else: variations = [bitmutation, simplexover, transposition]
+  if( 'operators' not in problem ): 
+    problem['operators'] = [lambda x, fx, v=v: apply(v, x, fx, problem) for v in variations]
+    problem['variations'] = variations
   return CHAVELA_T(problem)
 
 # Standard CHAVELA1 for Binary problems
 def CHAVELA1(problem):
-  if( 'operators' not in problem ): problem['operators'] = [powerlawmutation, singlebitmutation]
+  if( 'operators' not in problem ): 
+    if(ispacked(problem)):
+      D = problem['D']
+      problem['operators'] = [lambda x: ppowerlawmutation(x, D), lambda x: psinglebitmutation(x, D)]
+    else: problem['operators'] = [powerlawmutation, singlebitmutation]
   return CHAVELA1_T(problem) 
 
 ##################### TEST FUNCTIONS #####################
@@ -147,6 +254,13 @@ def maxones(x, start=0, end=-1):
     s += x[i]
   return s
 
+# MaxOnes function of a packed BitArray (popcount) from the start bit upto end-1 bit.
+# Counts bits up to the end of the BitArray if end is set to -1
+def pmaxones(x, start=0, end=-1):
+  x >>= start
+  if(end>=0): x &= (1 << (end-start)) - 1
+  return x.bit_count()
+
 # Goldberg's 3-Deceptive function, as defined in 
 # D. Goldberg, B. Korb, and K. Deb, “Messy genetic algorithms: 
 # motivation, analysis, and first results,” 
@@ -252,9 +366,149 @@ def mixed2(x, start=0, end=-1):
     start += 40
   return f 
 
+##################### INCREMENTAL (DELTA) EVALUATION #####################
+# Additively decomposable functions: the function value is the sum of the values of consecutive blocks of bits
+# (all of them of the same size). Such function is described (key 'blocks' of a problem) by a pair (size, f) where 
+# f(x, start, end) computes the function on the bits of x from start to end-1 (as the test functions above do).
+# The candidate solution obtained by changing a set of bits of x is evaluated by recomputing only the blocks
+# containing those bits.
+# Block size of each test function
+BLOCKS = {maxones:1, deceptive:3, boundedly:4, royalroad8:8, royalroad16:16, mixed:20, mixed2:40}
+
+# Incremental evaluation: f value of y, a candidate solution obtained by changing the bits in the indices array k of x.
+# Records the evaluation as a regular function evaluation (see sgoal.core.rec)
+def blockdelta(y, k, x, fx, sgoal):
+  size, f = sgoal['blocks']
+  B = {i - i % size for i in k}
+  if(len(B)*size >= len(x) or refresh(sgoal)): fy = sgoal['objective'](y)
+  else:
+    fy = fx
+    for start in B: fy += f(y, start, start+size) - f(x, start, start+size)
+  rec(y, fy, sgoal)
+  return fy
+
+# Flip a bit -> variation form (incremental evaluation)
+def dflip(x, fx, k, sgoal):
+  y = flip(x, k)
+  fy = blockdelta(y, [k], x, fx, sgoal)
+  return y, fy
+
+# Multi Flip bits -> variation form (incremental evaluation). Flips all the bits if k is empty
+def dmultiflip(x, fx, k, sgoal):
+  if(len(k)==0): k=[i for i in range(len(x))]
+  y = multiflip(x, k)
+  fy = blockdelta(y, k, x, fx, sgoal)
+  return y, fy
+
+# Single bit mutation -> variation form (incremental evaluation)
+def dsinglebitmutation(x, fx, sgoal): return dflip(x, fx, rand.randint(0,len(x)-1), sgoal)
+
+# Bit mutation -> variation form (incremental evaluation). Flips a bit with probability 1/|x|
+def dbitmutation(x, fx, sgoal):
+  y, k = bitmutationflips(x, 1.0/len(x))
+  fy = blockdelta(y, k, x, fx, sgoal)
+  return y, fy
+
+# In place variations (mutable genome, see sgoal.gabo): Flip the bits of x itself (instead of a copy), evaluate it 
+# and return its new f value. Multi flip versions flip all the bits if k is empty
+def iflip(x, fx, k, sgoal): return imultiflip(x, fx, [k], sgoal)
+
+def imultiflip(x, fx, k, sgoal):
+  if(len(k)==0): k=range(len(x))
+  for i in k: x[i] = 1 - x[i]
+  fx = sgoal['objective'](x)
+  recmutable(x, fx, sgoal)
+  return fx
+
+# In place variations with incremental evaluation (see blockdelta)
+def diflip(x, fx, k, sgoal): return dimultiflip(x, fx, [k], sgoal)
+
+def dimultiflip(x, fx, k, sgoal):
+  size, f = sgoal['blocks']
+  if(len(k)==0): k=range(len(x))
+  B = {i - i % size for i in k}
+  full = len(B)*size >= len(x) or refresh(sgoal)
+  if(not full):
+    for start in B: fx -= f(x, start, start+size)
+  for i in k: x[i] = 1 - x[i]
+  if(full): fx = sgoal['objective'](x)
+  else:
+    for start in B: fx += f(x, start, start+size)
+  recmutable(x, fx, sgoal)
+  return fx
+
+# Determines if the problem provides incremental evaluation
+def isdelta(problem): return 'blocks' in problem and not ispacked(problem)
+
+##################### TEST FUNCTIONS (POPULATION VERSIONS) #####################
+# Population versions of the test functions: compute the function on each row of an N x D population matrix 
+# (a list of BitArrays or a 2D array) at once, using block reshapes and lookup tables. Return an array of N values
+# Population matrix (N x D array of 0/1 values) of a list of BitArrays
+def popmatrix(P): return np.asarray(P, dtype=np.uint8).reshape(len(P), -1)
+
+# Population matrix (N x D array of 0/1 values) of a list of packed BitArrays of length D
+def unpackPop(P, D):
+  nb = (D+7)//8
+  b = np.frombuffer(b''.join([x.to_bytes(nb, 'little') for x in P]), dtype=np.uint8).reshape(len(P), nb)
+  return np.unpackbits(b, axis=1, bitorder='little')[:,:D]
+
+# Sum of bits
+def maxonesPop(P): return popmatrix(P).sum(1, dtype=np.int64)
+
+# Goldberg's 3-Deceptive function: value of each 3 bits block (bit k of the block has weight 2^k)
+DECEPTIVE = np.array([28, 26, 22, 0, 14, 0, 0, 30], dtype=np.int64)
+def deceptivePop(P):
+  X = popmatrix(P)
+  B = X.reshape(len(X), -1, 3) @ np.array([1, 2, 4], dtype=np.uint8)
+  return DECEPTIVE[B].sum(1)
+
+# Goldberg's Boundedly-Deceptive function: value of a block according to its number of ones u (0..size)
+def boundedlytable(size): return np.array([size-1-u for u in range(size)] + [size], dtype=np.int64)
+
+def generic_boundedlyPop(P, size):
+  X = popmatrix(P)
+  U = X.reshape(len(X), -1, size).sum(2)
+  return boundedlytable(size)[U].sum(1)
+
+def boundedlyPop(P): return generic_boundedlyPop(P, 4)
+
+# Forrest's Royal Road function
+def generic_royalroadPop(P, size):
+  X = popmatrix(P)
+  return size*X.reshape(len(X), -1, size).all(2).sum(1, dtype=np.int64)
+
+def royalroad8Pop(P): return generic_royalroadPop(P, 8)
+
+def royalroad16Pop(P): return generic_royalroadPop(P, 16)
+
+# The mixed function (blocks of 20 bits)
+def mixedPop(P):
+  X = popmatrix(P)
+  N = len(X)
+  Y = X.reshape(N, -1, 20)
+  return (maxonesPop(Y[:,:,0:5].reshape(N,-1)) + deceptivePop(Y[:,:,5:8].reshape(N,-1)) + 
+          boundedlyPop(Y[:,:,8:12].reshape(N,-1)) + royalroad8Pop(Y[:,:,12:20].reshape(N,-1)))
+
+# The mixed function 2 (blocks of 40 bits)
+def mixed2Pop(P):
+  X = popmatrix(P)
+  N = len(X)
+  Y = X.reshape(N, -1, 40)
+  return (maxonesPop(Y[:,:,0:10].reshape(N,-1)) + deceptivePop(Y[:,:,10:16].reshape(N,-1)) + 
+          boundedlyPop(Y[:,:,16:24].reshape(N,-1)) + royalroad16Pop(Y[:,:,24:40].reshape(N,-1)))
+
+# Population version of each test function
+POPVERSION = {maxones:maxonesPop, deceptive:deceptivePop, boundedly:boundedlyPop, royalroad8:royalroad8Pop,
+  royalroad16:royalroad16Pop, mixed:mixedPop, mixed2:mixed2Pop}
+
 ##################### TEST PROBLEMS ####################
-def TestProblem(f, D, EVALS, TRACE=False):
-  space = Binary(D)
+# PACKED: Uses packed BitArrays (see PackedBinary) if set to True
+# BATCH: Provides the population version of the test function as vectorized objective function if set to True
+# DELTA: Provides incremental evaluation ('blocks' key) and the incremental 'flip' and 'multiflip' variations used by 
+#   GABO (and their in place versions 'iflip' and 'imultiflip') if set to True (not available for packed BitArrays)
+# Unpacked problems without DELTA get the (fully evaluating) in place variations iflip and imultiflip
+def TestProblem(f, D, EVALS, TRACE=False, PACKED=False, BATCH=False, DELTA=False):
+  space = PackedBinary(D) if PACKED else Binary(D)
   space['optimum'] = D
   if(f=='MaxOnes'): f = maxones
   elif(f=='GD3'): 
@@ -270,4 +524,20 @@ def TestProblem(f, D, EVALS, TRACE=False):
     f = mixed2
     space['optimum'] = 47*D/20
   else: f = maxones
-  return PROBLEM('max', f, space, EVALS, TRACE)
+  fbatch = None
+  if(BATCH):
+    fbatch = POPVERSION[f]
+    if(PACKED): fbatch = lambda P, fb=fbatch: fb(unpackPop(P, D))
+  size = BLOCKS[f]
+  if(PACKED): f = pmaxones if f==maxones else unpacked(f, D)
+  problem = PROBLEM('max', f, space, EVALS, TRACE, fbatch)
+  if(DELTA and not PACKED):
+    problem['blocks'] = (size, f)
+    problem['flip'] = lambda x, fx, k: dflip(x, fx, k, problem)
+    problem['multiflip'] = lambda x, fx, k: dmultiflip(x, fx, k, problem)
+    problem['iflip'] = lambda x, fx, k: diflip(x, fx, k, problem)
+    problem['imultiflip'] = lambda x, fx, k: dimultiflip(x, fx, k, problem)
+  elif(not PACKED):
+    problem['iflip'] = lambda x, fx, k: iflip(x, fx, k, problem)
+    problem['imultiflip'] = lambda x, fx, k: imultiflip(x, fx, k, problem)
+  return problem
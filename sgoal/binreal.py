@@ -17,14 +17,22 @@
 # HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) 
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import numpy as np
+from functools import partial
 from sgoal.core import PROBLEM
 from sgoal.binary import Binary
+from sgoal.binary import dflip
+from sgoal.binary import dmultiflip
+from sgoal.binary import diflip
+from sgoal.binary import dimultiflip
 from sgoal.real import rastrigin
 from sgoal.real import sphere
 from sgoal.real import rosenbrock_saddle
 from sgoal.real import ackley
 from sgoal.real import griewank
 from sgoal.real import schwefel
+from sgoal.real import POPVERSION
+from sgoal.real import SEPARABLE
 
 ##################### INTERVAL TO BINARY #####################
 # Grows a binary representation to real vector representation
@@ -38,12 +46,54 @@ def grow1(x, min, length, SIZE, i=0):
     p *= 2
   return min + (s/p)*length
 
+# Grows a Gray coded binary representation to real vector representation
+def grow1gray(x, min, length, SIZE, i=0):
+  s = 0
+  start = i*SIZE
+  for k in range(start+SIZE-1, start-1, -1):
+    s = 2*s + (1 if x[k] else 0)
+  shift = 1
+  while(shift < SIZE):
+    s ^= s >> shift
+    shift *= 2
+  return min + (s/2**SIZE)*length
+
+##################### VECTORIZED DECODING #####################
+# Decoder of BitArrays with n real values of SIZE bits each (the k-th bit of a value has weight 2^k). A dictionary 
+# with keys 'n', 'SIZE', 'min', 'length' (numpy arrays), 'gray' and 'weights': 2^k/2^SIZE for each bit k (precomputed
+# once, so a value is the dot product of its bits and the weights). Exact for SIZE<=52 (same values as grow1)
+# gray: If the bits of each value are Gray coded
+def DECODER(min, length, SIZE=32, gray=False):
+  return {'n':len(min), 'SIZE':SIZE, 'min':np.asarray(min, dtype=np.float64), 'gray':gray,
+          'length':np.asarray(length, dtype=np.float64), 'weights':2.0**np.arange(SIZE) / 2.0**SIZE}
+
+# Gray code to binary code: bit k of the binary code is the xor of Gray bits k..SIZE-1 (the highest bit is the last one)
+def gray2binary(B): return np.bitwise_xor.accumulate(B[...,::-1], axis=-1)[...,::-1]
+
+# BitArray (list of 0/1 values) or population as an array of 0/1 values
+def bitarray(x):
+  if(isinstance(x, list) and len(x)>0 and isinstance(x[0], int)): return np.frombuffer(bytes(x), dtype=np.uint8)
+  return np.asarray(x, dtype=np.uint8)
+
+# Decodes a BitArray (as a list of real values) or each row of a population matrix (as an N x n array)
+def decode(x, decoder):
+  X = bitarray(x)
+  B = X.reshape(X.shape[:-1] + (decoder['n'], decoder['SIZE']))
+  if(decoder['gray']): B = gray2binary(B)
+  R = decoder['min'] + (B @ decoder['weights']) * decoder['length']
+  return R.tolist() if X.ndim==1 else R
+
+# Decodes the real value encoded by a BitArray (see decode)
+def decode1(x, decoder): return decode(x, decoder)[0]
+
 # Interval to Binary Space
-def Interval2Binary(min, max, BITSIZE=32):
+def Interval2Binary(min, max, BITSIZE=32, GRAY=False):
   D = BITSIZE
   space = Binary(D)
   length = max - min
-  space['grow'] = lambda x: grow1(x, min, length, BITSIZE)
+  decoder = DECODER([min], [length], BITSIZE, GRAY)
+  space['grow'] = partial(decode1, decoder=decoder)
+  space['decoder'] = decoder
   return space
 
 ##################### HYPERECTANGLE/HYPERCUBE TO BINARY #####################
@@ -52,31 +102,76 @@ def grow(x, min, length, SIZE=16):
   return [grow1(x, min[i], length[i], SIZE, i) for i in range(len(x)//SIZE)]
 
 # HyperRectangle to Binary Space
-def HyperRectangle2Binary(min, max, BITSIZE=32):
+# GRAY: If the bits of each real value are Gray coded
+def HyperRectangle2Binary(min, max, BITSIZE=32, GRAY=False):
   D = len(min)*BITSIZE
   space = Binary(D)
   length = [max[i]-min[i] for i in range(len(min))]
-  space['grow'] = lambda x: grow(x, min, length, BITSIZE)
+  decoder = DECODER(min, length, BITSIZE, GRAY)
+  space['grow'] = partial(decode, decoder=decoder)
+  space['decoder'] = decoder
   return space
 
 # HyperCube to Binary Space
-def HyperCube2Binary(min, max, D=2, BITSIZE=32):
+def HyperCube2Binary(min, max, D=2, BITSIZE=32, GRAY=False):
   if(D<2): D=2
-  return HyperRectangle2Binary([min for i in range(D)], [max for i in range(D)], BITSIZE)
+  return HyperRectangle2Binary([min for i in range(D)], [max for i in range(D)], BITSIZE, GRAY)
+
+# Function f on the real values encoded by the BitArray x
+def growf(x, f, grow): return f(grow(x))
+
+# Population version of f on the real values encoded by the BitArrays in P
+def decodepop(P, fpop, decoder): return fpop(decode(np.asarray(P).reshape(len(P), -1), decoder))
+
+# Realvalued Problem to Binary problem. Objective functions are functools.partial objects (picklable if f, fpop and
+# the space grow function are), so they can be sent to a process pool (see 'executor' in sgoal.core.PopSGoal)
+# fpop: Population version of f (on an N x n matrix of real values), used as vectorized objective function if provided
+def Real2BinaryPROBLEM(type, f, space, EVALS, TRACE=False, fpop=None):
+  fbatch = None
+  if(fpop!=None): fbatch = partial(decodepop, fpop=fpop, decoder=space['decoder'])
+  return PROBLEM(type, partial(growf, f=f, grow=space['grow']), space, EVALS, TRACE, fbatch)
+
+##################### INCREMENTAL EVALUATION #####################
+# Block function (see sgoal.binary.blockdelta) of a separable function f(x) = sum_i c + t(x_i) on the binary 
+# representation: computes the function terms of the real values encoded from the start bit upto end-1 bit
+def separableblock(t, c, decoder):
+  SIZE, min, length = decoder['SIZE'], decoder['min'].tolist(), decoder['length'].tolist()
+  g = grow1gray if decoder['gray'] else grow1
+  def block(x, start, end):
+    s = 0.0
+    for i in range(start//SIZE, end//SIZE): s += c + t(g(x, min[i], length[i], SIZE, i))
+    return s
+  return block
 
-# Realvalued Problem to Binary problem
-def Real2BinaryPROBLEM(type, f, space, EVALS, TRACE=False):
-  return PROBLEM(type, lambda x: f(space['grow'](x)), space, EVALS, TRACE)
+# Sets the incremental evaluation ('blocks' key, flip variations) of a Real2Binary problem with a separable function
+# (each real value is a block, so flipping a bit updates a single term of the function), see sgoal.binary.blockdelta.
+# Performs a full evaluation every 'refresh' evaluations
+def setdelta(problem, f, refresh=1000):
+  t, c = SEPARABLE[f]
+  decoder = problem['decoder']
+  problem['blocks'] = (decoder['SIZE'], separableblock(t, c, decoder))
+  problem['refresh'] = refresh
+  problem['flip'] = lambda x, fx, k: dflip(x, fx, k, problem)
+  problem['multiflip'] = lambda x, fx, k: dmultiflip(x, fx, k, problem)
+  problem['iflip'] = lambda x, fx, k: diflip(x, fx, k, problem)
+  problem['imultiflip'] = lambda x, fx, k: dimultiflip(x, fx, k, problem)
+  return problem
 
 ##################### Real valued test problems as Binary problems ####################
-def Real2BinaryTestProblem(f, D, EVALS, BITSIZE = 32, TRACE=False):
+# GRAY: Uses Gray coded real values if set to True
+# BATCH: Provides the population version of the test function as vectorized objective function if set to True
+# DELTA: Provides incremental evaluation (see setdelta) if set to True and the test function is separable (Sphere, 
+#   Rastrigin, Schwefel), other test functions are always fully evaluated
+def Real2BinaryTestProblem(f, D, EVALS, BITSIZE = 32, TRACE=False, GRAY=False, BATCH=False, DELTA=False):
   if(D<2): D = 2
-  if(f=='Rastrigin'): problem = Real2BinaryPROBLEM('min', rastrigin, HyperCube2Binary(-5.12, 5.12, D, BITSIZE), EVALS, TRACE)
-  elif(f=='Schwefel'): problem = Real2BinaryPROBLEM('min', schwefel, HyperCube2Binary(-500.0, 500.0, D, BITSIZE), EVALS, TRACE)
-  elif(f=='Griewank'): problem = Real2BinaryPROBLEM('min', griewank, HyperCube2Binary(-600.0, 600.0, D, BITSIZE), EVALS, TRACE)
-  elif(f=='Rosenbrock'): problem = Real2BinaryPROBLEM('min', rosenbrock_saddle, HyperCube2Binary(-2.048, 2.048, D, BITSIZE), EVALS, TRACE)
-  elif(f=='Ackley'): problem = Real2BinaryPROBLEM('min', ackley, HyperCube2Binary(-32.768, 32.768, D, BITSIZE), EVALS, TRACE)
-  elif(f=='Sphere'): problem = Real2BinaryPROBLEM('min', sphere, HyperCube2Binary(-5.12, 5.12, D, BITSIZE), EVALS, TRACE)
-  else: problem = Real2BinaryPROBLEM('min', sphere, HyperCube2Binary(-5.12, 5.12, D, BITSIZE), EVALS, TRACE)
+  if(f=='Rastrigin'): f, space = rastrigin, HyperCube2Binary(-5.12, 5.12, D, BITSIZE, GRAY)
+  elif(f=='Schwefel'): f, space = schwefel, HyperCube2Binary(-500.0, 500.0, D, BITSIZE, GRAY)
+  elif(f=='Griewank'): f, space = griewank, HyperCube2Binary(-600.0, 600.0, D, BITSIZE, GRAY)
+  elif(f=='Rosenbrock'): f, space = rosenbrock_saddle, HyperCube2Binary(-2.048, 2.048, D, BITSIZE, GRAY)
+  elif(f=='Ackley'): f, space = ackley, HyperCube2Binary(-32.768, 32.768, D, BITSIZE, GRAY)
+  elif(f=='Sphere'): f, space = sphere, HyperCube2Binary(-5.12, 5.12, D, BITSIZE, GRAY)
+  else: f, space = sphere, HyperCube2Binary(-5.12, 5.12, D, BITSIZE, GRAY)
+  problem = Real2BinaryPROBLEM('min', f, space, EVALS, TRACE, POPVERSION[f] if BATCH else None)
   problem['optimum'] = 0.0
-  return problem
\ No newline at end of file
+  if(DELTA and f in SEPARABLE): setdelta(problem, f)
+  return problem
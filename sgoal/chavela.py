@@ -24,17 +24,27 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 from sgoal.core import caneval
+from sgoal.core import batchmode
+from sgoal.core import recPop
+from sgoal.core import isarray
+from sgoal.core import buffers
 from sgoal.core import SPSGoal
 from sgoal.core import PopSGoal
 from sgoal.util import normalize
+from sgoal.util import uniforms
 from sgoal.select import weighted
+from sgoal.select import weightedrows
 from sgoal.util import arity
+from sgoal.util import seed
 from sgoal.select import min_tournament
 from sgoal.select import max_tournament
 from sgoal.core import initPop
 from sgoal.core import init as initcore
 
+import os
 import random as rand
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
   
 ############ RATES OPERATIONS ############
 
@@ -42,6 +52,10 @@ import random as rand
 def initRates(M):
   return [1/M for i in range(M)]
 
+# Init Rates for a population: an N x M array (row i has the operator rates of individual i)
+def initRatesPop(N, M):
+  return np.full((N, M), 1/M)
+
 # Determines if the fitness of the second individual is better than the fitness of the first one
 # minimization
 def min_improves(fx, fy):
@@ -60,21 +74,27 @@ def updateRates(improves, h, rate):
     rate[h] *= (1.0-delta)
   return normalize(rate)
 
-# Trace rates
+# Update rates of the first len(H) individuals of the population (in place). H[i] is the operator applied by 
+# individual i and I[i] determines if the offspring improves it. Random numbers are drawn from Python's generator
+def updateRatesPop(I, H, rates):
+  m = len(H)
+  if(m==0): return rates
+  delta = uniforms(m)
+  rows = np.arange(m)
+  rates[rows, H] *= np.where(I, 1.0+delta, 1.0-delta)
+  rates[:m] /= rates[:m].sum(axis=1, keepdims=True)
+  return rates
+
+# Trace rates (average operator rates of the population)
 def tracerates(rates, trace):
   if( trace == None): return
 
   if('rates' not in trace):
     trace['rates'] = []
-  r = rates[0].copy()
-  for i in range(1, len(rates)):
-    for k in range(len(r)):
-      r[k] += rates[i][k]
-  for k in range(len(r)):
-    r[k] /= len(rates)
-  trace['rates'].append(r)
+  trace['rates'].append(rates.mean(axis=0).tolist())
 
-def apply( oper, x, fx, sgoal ):
+# Parents used by the variation operator for producing a candidate solution from x (selects additional parents if required)
+def parents( oper, x, sgoal ):
   P, fP, selection = sgoal['P'], sgoal['fP'], sgoal['selection']
   a = arity(oper) 
   if a > 1: 
@@ -82,10 +102,18 @@ def apply( oper, x, fx, sgoal ):
     idxparents = selection(fP,a-1)
     for k in idxparents:
       parents.append(P[k])
-    c = oper(*parents)
-    c = c[rand.randint(0,len(c)-1)]
-  else: 
-    c = oper(x)
+    return parents
+  return [x]
+
+# Produces a candidate solution from x using the variation operator (selects additional parents if required)
+def produce( oper, x, sgoal ):
+  p = parents(oper, x, sgoal)
+  c = oper(*p)
+  if len(p) > 1: c = c[rand.randint(0,len(c)-1)]
+  return c
+
+def apply( oper, x, fx, sgoal ):
+  c = produce(oper, x, sgoal)
   fc = sgoal['f'](c)
   return c, fc
 
@@ -96,36 +124,112 @@ def init(sgoal):
   N = sgoal['N']
   P, fP = sgoal['innerInit'](sgoal)
   M = len(sgoal['operators'])
-  sgoal['rates'] = [initRates(M) for i in range(N)]
+  sgoal['rates'] = initRatesPop(N, M)
   tracerates(sgoal['rates'], sgoal['trace'])
   return P, fP
 
+# Storage for the next population (double buffers if the population is stored in an array)
+def newPop(P, fP, sgoal):
+  if(isarray(sgoal)): return buffers(P, fP, sgoal)
+  N = len(P)
+  return [None]*N, [None]*N
+
+# CHAVELA next population method (batch version). Produces the offspring of the individuals (as many as the 
+# evaluations budget allows) using the 'variations' operators and evaluates them in a single call. Operators are 
+# chosen for the whole population (as in the sequential version), so both versions draw the same random numbers
+def nextBatch(P, fP, sgoal):
+  improves, variations, pick, N, rates = sgoal['improves'], sgoal['variations'], sgoal['pick'], sgoal['N'], sgoal['rates']
+  M = max(0, min(N, sgoal['EVALS'] - sgoal['count']))
+  H = weightedrows(rates)[:M]
+  C = [produce(variations[H[i]], P[i], sgoal) for i in range(M)]
+  fC = sgoal['fpop'](C)
+  Q, fQ = newPop(P, fP, sgoal)
+  I = [improves(fP[i], fC[i]) for i in range(M)]
+  for i in range(N):
+    if(i<M): Q[i], fQ[i], p, fp = pick(P[i], fP[i], C[i], fC[i])
+    else: Q[i], fQ[i] = P[i], fP[i]
+  P, fP = Q, fQ
+  updateRatesPop(I, H, rates)
+  tracerates(rates, sgoal['trace'])
+  return P, fP
+
+# Produces a candidate solution from the parents using the variation operator and computes its objective function 
+# value (a job of the parallel version, may run in a worker process). The random number generators are seeded with 
+# the given seed, so the candidate solution does not depend on the worker running the job
+def job( oper, parents, s, f ):
+  seed(s)
+  c = oper(*parents)
+  if len(parents) > 1: c = c[rand.randint(0,len(c)-1)]
+  return c, f(c)
+
+# Determines if CHAVELA produces and evaluates the offspring in parallel
+def parallelmode(sgoal):
+  return 'parallel' in sgoal and sgoal['parallel'] and 'variations' in sgoal
+
+# CHAVELA next population method (parallel version). Reserves the evaluations of the generation (as many as the 
+# budget allows) and sends a job (operator, parents, seed) per individual to the executor (runs them in the current 
+# process if no executor is provided). Parents and seeds are drawn in the main process, and evaluations, rates and 
+# replacements are recorded in the population order, so runs are reproducible. The executor must be process based 
+# (jobs seed and use the process global random number generators, shared by threads). The evaluation cache is not used
+def nextParallel(P, fP, sgoal):
+  improves, variations, pick, N, rates = sgoal['improves'], sgoal['variations'], sgoal['pick'], sgoal['N'], sgoal['rates']
+  M = max(0, min(N, sgoal['EVALS'] - sgoal['count']))
+  H = weightedrows(rates)[:M]
+  opers = [variations[H[i]] for i in range(M)]
+  args = (opers, [parents(opers[i], P[i], sgoal) for i in range(M)], [rand.getrandbits(32) for i in range(M)], 
+          [sgoal['objective']]*M)
+  state, npstate = rand.getstate(), np.random.get_state()
+  executor = sgoal['executor'] if 'executor' in sgoal else None
+  if(isinstance(executor, ThreadPoolExecutor)): 
+    raise ValueError("parallel CHAVELA requires a process based executor (threads share the random number generators)")
+  if(executor == None): R = list(map(job, *args))
+  else:
+    chunksize = sgoal['chunksize'] if 'chunksize' in sgoal else None
+    if(chunksize==None): chunksize = max(1, M//(4*(os.cpu_count() or 1)))
+    R = list(executor.map(job, *args, chunksize=chunksize))
+  rand.setstate(state)
+  np.random.set_state(npstate)
+  C, fC = [r[0] for r in R], [r[1] for r in R]
+  recPop(C, fC, sgoal)
+  Q, fQ = newPop(P, fP, sgoal)
+  I = [improves(fP[i], fC[i]) for i in range(M)]
+  for i in range(N):
+    if(i<M): Q[i], fQ[i], p, fp = pick(P[i], fP[i], C[i], fC[i])
+    else: Q[i], fQ[i] = P[i], fP[i]
+  P, fP = Q, fQ
+  updateRatesPop(I, H, rates)
+  tracerates(rates, sgoal['trace'])
+  return P, fP
+
 # CHAVELA next population method
 def next(P, fP, sgoal):
+  if(parallelmode(sgoal)): return nextParallel(P, fP, sgoal)
+  if(batchmode(sgoal) and 'variations' in sgoal): return nextBatch(P, fP, sgoal)
   improves, operators, pick, N, rates = sgoal['improves'], sgoal['operators'], sgoal['pick'], sgoal['N'], sgoal['rates']
-  Q = []
-  fQ = []
-  rQ = []
+  Q, fQ = newPop(P, fP, sgoal)
+  H = weightedrows(rates)
+  I = []
   for i in range(N):
     if(caneval(sgoal)):
-      h = weighted(rates[i])
-      c, fc = operators[h](P[i], fP[i])
-      rQ.append(updateRates(improves(fP[i], fc), h, rates[i]))
-      c, fc, p, fp = pick(P[i], fP[i], c, fc)
-      Q.append(c)
-      fQ.append(fc)
+      c, fc = operators[H[i]](P[i], fP[i])
+      I.append(improves(fP[i], fc))
+      Q[i], fQ[i], p, fp = pick(P[i], fP[i], c, fc)
     else:
-      Q.append(P[i])
-      fQ.append(fP[i])
-      rQ.append(rates[i])
-  P, fP, sgoal['rates'] = Q, fQ, rQ
-  tracerates(sgoal['rates'], sgoal['trace'])
+      Q[i], fQ[i] = P[i], fP[i]
+  P, fP = Q, fQ
+  updateRatesPop(I, H[:len(I)], rates)
+  tracerates(rates, sgoal['trace'])
   return P, fP
 
 ############ Generic Canonical HAEA: Chavela ##########
 # Extends the Population SGOAL with the following keys:
-#   'rates': operator's rates one by each candidate solution in the population
+#   'rates': operator's rates one by each candidate solution in the population (an N x M array)
 #   'operators': A list with the variation operators used by CHAVELA 
+#   'variations': Optional list with the (not evaluating) variation operators associated to each one of the operators.
+#       If provided and the problem has a vectorized objective function, the offspring is evaluated in a single call
+#   'parallel': If set to True (and 'variations' is provided), the offspring is produced and evaluated by the 
+#       'executor' (see nextParallel), that must be process based (for instance a ProcessPoolExecutor). Variations and 
+#       objective function must be picklable
 #   'innerInit': Inner Init Population method by default set to initPop from sgoal.core
 def CHAVELA_T(problem):
   if(problem['minimize']): 
@@ -133,7 +237,7 @@ def CHAVELA_T(problem):
     if('selection' not in problem): problem['selection'] = min_tournament
   else: 
     problem['improves'] = max_improves
-    problem['selection'] = max_tournament
+    if('selection' not in problem): problem['selection'] = max_tournament
   if('init' in problem): problem['innerInit'] = problem['init']
   else: problem['innerInit'] = initPop
   problem['init'] = lambda : init(problem)
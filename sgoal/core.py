@@ -22,9 +22,20 @@
 # HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) 
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import os
+import time
 import random as rand
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+from itertools import islice
+from array import array
+from hashlib import blake2b
+from collections import OrderedDict
 from sgoal.util import randbool
 from sgoal.util import arity
+from sgoal.util import runseed
+from sgoal.util import seed as randseed
 
 ############### SEARCH SPACE AND  PROBLEM ################
 
@@ -45,19 +56,38 @@ def SPACE(g, gn = None, feasible = lambda x: True):
 # Problem. Extends the Space dictionary with the following keys
 #   'type' : set to 'min' for minimization, set to 'max' for maximization
 #   'f' : Wraps the objective function with function eval to record the best progression and traced information
+#   'objective': The (not wrapped) objective function
+#   'fbatch': Vectorized objective function (if provided), i.e., computes the objective function values of a list of 
+#       candidate solutions in a single call
+#   'fpop': Evaluates a population of candidate solutions (using the vectorized objective function if provided) and 
+#       records the best progression and traced information
 #   'EVALS': Maximum number of function evaluations
+#   'cache': Evaluation cache (see CACHE), by default set to None (no cache). Can be set after creating the problem
 #   'minimize': Set to True if the problem is a minimization problem and set to False if a maximization one
 #   'pick': Sorts two solutions accoriding to the type of optimization problem (first is the best)
 #   'trace': A dictionary with all the information to be traced if required (when set to True in the problem)
 #       'f': Evolution (in time) of values of the objective function (calls)
 #       'fP':Evolution (in time) of values of the objective function for a population based method
-def PROBLEM(type, f, space, EVALS, TRACE=False):
-  space['f'] = lambda x: eval(x, f, space)
+#       'best': Evolution (in time) of the best value of the objective function
+#     TRACE can also be a trace sink (a dictionary with appendable columns, see TRACESINK in sgoal.trace)
+def PROBLEM(type, f, space, EVALS, TRACE=False, fbatch=None):
+  space['objective'] = f
+  # eval inlined if there is no evaluation cache (one call per function evaluation less)
+  def feval(x):
+    if(space['cache'] != None): return eval(x, f, space)
+    fx = f(x)
+    rec(x, fx, space)
+    return fx
+  space['f'] = feval
+  if(fbatch!=None): space['fbatch'] = fbatch
+  space['fpop'] = lambda P: evalBatch(P, space)
   space['EVALS'] = EVALS
+  if('cache' not in space): space['cache'] = None
   space['minimize'] = type=='min'
   if(space['minimize']): space['pick'] = min_pick
   else: space['pick'] = max_pick
-  if(TRACE): space['trace'] = {'f':[], 'fP':[], 'best':[]}
+  if(isinstance(TRACE, dict)): space['trace'] = TRACE
+  elif(TRACE): space['trace'] = {'f':[], 'fP':[], 'best':[]}
   else: space['trace'] = None
   return space
 
@@ -79,14 +109,17 @@ def variation21( x, y, fx, fy, oper, sgoal):
 def variation22( x, fx, y, fy, oper, sgoal):  
   y1, y2 = oper(x, y)
   if(randbool()): y1, y2 = y2, y1
-  fy1 = sgoal['f'](y1)
-  fy2 = sgoal['f'](y2)
+  f = sgoal['f']
+  fy1 = f(y1)
+  fy2 = f(y2)
   return y1, fy1, y2, fy2
 
 # Simple crossover.
 def simplexover( x1, x2 ):
   n = len(x1)
   p = rand.randint(1,n-1)
+  if(isinstance(x1, np.ndarray)): 
+    return np.concatenate((x1[0:p], x2[p:n])), np.concatenate((x2[0:p], x1[p:n]))
   y1 = x1[0:p] + x2[p:n]
   y2 = x2[0:p] + x1[p:n]
   return y1, y2
@@ -111,6 +144,11 @@ def transposition( x ):
   return y
 
 ############### UTILITY FUNCTIONS ##############
+# A candidate solution that is not a view of an array population (copies it if required), so it can be kept as the best one
+def own(x):
+  if(isinstance(x, np.ndarray) and x.base is not None): return x.copy()
+  return x
+
 # Returns two candidate solutions according to their function value and minimization problem
 # The first solution returned is the best one. 
 def min_pick(x, fx, y, fy):
@@ -130,21 +168,110 @@ def rec(x, fx, sgoal):
   sgoal['count'] += sgoal['delta']
 
   if('best' not in sgoal):
-    sgoal['best'] ={'x':x, 'f':fx, 'evals':sgoal['count']}
-    best = sgoal['best']
+    best = sgoal['best'] = {'x':own(x), 'f':fx, 'evals':sgoal['count']}
   else:
     best = sgoal['best']
     best['x'], best['f'], b, fb = sgoal['pick'](best['x'], best['f'], x, fx)
     if(best['f'] != fb and fx != fb): best['evals'] = sgoal['count']
+    if(best['x'] is x and isinstance(x, np.ndarray)): best['x'] = own(x)
+
+  trace = sgoal['trace']
+  if(trace != None): 
+    trace['f'].append(fx)
+    trace['best'].append(best['f'])
+
+# Determines if an incremental evaluation must be replaced by a full one, when the problem has a 'refresh' key 
+# (every 'refresh' evaluations, so rounding errors of real valued incremental evaluations do not accumulate)
+def refresh(sgoal): return 'refresh' in sgoal and sgoal['count'] % sgoal['refresh'] == 0
+
+# Traces a candidate solution that is modified in place after being traced (a mutable genome, see sgoal.gabo). 
+# The candidate solution is copied only if it is strictly better than the best one so far (on ties, the best 
+# candidate solution is kept)
+def recmutable(x, fx, sgoal):
+  if('best' in sgoal):
+    fb = sgoal['best']['f']
+    if(fx == fb or sgoal['pick'](None, fb, None, fx)[1] != fx): 
+      rec(sgoal['best']['x'], fx, sgoal)
+      return
+  rec(x.copy(), fx, sgoal)
+
+# Traces a batch of candidate solutions and their objective function values. Produces the same 
+# best/trace information as calling rec on each candidate solution, one by one, in the given order
+def recPop(P, fP, sgoal):
+  n = len(fP)
+  if(n==0): return
+  delta, count = sgoal['delta'], sgoal['count']
+  sgoal['count'] += n*delta
+  if(sgoal['minimize']): better, m = min, min(fP)
+  else: better, m = max, max(fP)
+  first = fP.index(m)
+  last = n - 1 - fP[::-1].index(m)
+  if('best' not in sgoal):
+    sgoal['best'] = {'x':own(P[last]), 'f':m, 'evals':count+(first+1)*delta}
+    fb = None
+  else:
+    best = sgoal['best']
+    fb = best['f']
+    if(better(fb, m)==m):
+      if(fb!=m): best['evals'] = count+(first+1)*delta
+      best['x'], best['f'] = own(P[last]), m
+
+  trace = sgoal['trace']
+  if(trace != None):
+    trace['f'].extend(fP)
+    if(fb==None): trace['best'].extend(accumulate(fP, better))
+    else: trace['best'].extend(islice(accumulate(fP, better, initial=fb), 1, None))
+
+############### EVALUATION CACHE ################
+# Evaluation cache: memoizes the objective function values of candidate solutions (keyed on a compact hash of 
+# the genome) keeping at most size values (least recently used values are evicted first). A dictionary with keys
+#   'table': LRU table (genome key -> objective function value)
+#   'size': Maximum number of stored values
+#   'counthits': If True a cache hit counts as a function evaluation (against EVALS), otherwise it is neither counted
+#       nor traced. Notice that an SGoal that only revisits cached candidate solutions never stops if hits are not counted
+#   'hits': Number of objective function values taken from the cache
+#   'misses': Number of objective function values not found in the cache
+def CACHE(size=65536, counthits=True):
+  return {'table':OrderedDict(), 'size':size, 'counthits':counthits, 'hits':0, 'misses':0}
+
+# Compact key of a candidate solution (a 16 bytes hash of its genome)
+def genomekey(x):
+  if(isinstance(x, (int, str, bytes))): return x
+  try: b = bytes(x)
+  except (TypeError, ValueError): b = array('d', x).tobytes()
+  return blake2b(b, digest_size=16).digest()
+
+# Gets the objective function value stored for the genome key (None if it is not in the cache)
+def cacheget(key, cache):
+  table = cache['table']
+  fx = table.get(key)
+  if(fx == None): 
+    cache['misses'] += 1
+  else:
+    table.move_to_end(key)
+    cache['hits'] += 1
+  return fx
 
-  if(sgoal['trace'] != None): 
-    sgoal['trace']['f'].append(fx)
-    sgoal['trace']['best'].append(best['f'])
+# Stores the objective function value of the genome key, evicts the least recently used value if required
+def cacheput(key, fx, cache):
+  table = cache['table']
+  table[key] = fx
+  if(len(table) > cache['size']): table.popitem(last=False)
 
-# Evaluates the objective function in a candidate solution (traces information)
+# Evaluates the objective function in a candidate solution (traces information). Uses the evaluation cache if provided
 def eval(x, f, sgoal):
-  fx = f(x)
-  rec(x, fx, sgoal)
+  cache = sgoal['cache']
+  if(cache == None):
+    fx = f(x)
+    rec(x, fx, sgoal)
+    return fx
+  key = genomekey(x)
+  fx = cacheget(key, cache)
+  if(fx == None):
+    fx = f(x)
+    cacheput(key, fx, cache)
+    rec(x, fx, sgoal)
+  elif(cache['counthits']): rec(x, fx, sgoal)
   return fx
 
 # Determines if the SGoal can eval the objective function n times
@@ -158,7 +285,7 @@ def optimumfound(sgoal):
 # Stops the SGoal if cannot eval the objective function anymore or the optimal
 # value is found (if available and for testing purposes)
 def basicstop(sgoal):
-  return not caneval(sgoal) or optimumfound(sgoal)
+  return sgoal['count'] >= sgoal['EVALS'] or sgoal['best']['f']==sgoal['optimum']
 
 ############### STOCHASTIC GLOBAL OPTIMIZATION ALGORITHM ################
 # Extends the Problem dictionary with the following keys
@@ -182,20 +309,29 @@ def SGOAL(problem):
   sgoal['count'] = 0
   sgoal['delta'] = 1
   if('optimum' not in sgoal): sgoal['optimum'] = None
-  if('stop' not in sgoal): sgoal['stop'] = lambda : basicstop(sgoal)
+  if('stop' not in sgoal): sgoal['stop'] = sgoal['basicstop'] = lambda : basicstop(sgoal)
   return sgoal
 
 # Runs the SGoal a maximum of MAXEVALS and traces information is desired
+# A Variation/Replace single point SGoal (see VRSGoal) is run with its next method inlined: the variation and replace
+# methods are called directly (looked up in each iteration, since an SGoal may change them while running, for instance
+# the 1/5th rule). The default stopping criteria (see SGOAL) is inlined as well
 def run( sgoal ):
   InitPop, Stop, NextPop, N, trace = sgoal['init'], sgoal['stop'], sgoal['next'], sgoal['N'], sgoal['trace']
   P, fP = InitPop()
   if(N>1): tracepop(fP, trace)
+  if(N==1 and NextPop is sgoal.get('vrnext')):
+    basic = Stop is sgoal.get('basicstop')
+    while( not (basicstop(sgoal) if basic else Stop()) ):
+      y, fy = sgoal['variation'](P, fP)
+      P, fP = sgoal['replace'](P, fP, y, fy)
   while( not Stop() ):
     P, fP = NextPop(P, fP)
     if(N>1): 
       sgoal['P'] = P
       sgoal['fP'] = fP
       tracepop(fP, trace)
+  if(trace!=None and 'flush' in trace): trace['flush']()
   return sgoal['best']
 
 ##################  SINGLE POINT SGOAL ####################
@@ -221,9 +357,8 @@ def SPSGoal(problem):
 ########### Variation/Replace Single Point SGOAL ###########
 # next method combining a variation and replacement strategies
 def next(x, fx, sgoal):
-  V, R = sgoal['variation'], sgoal['replace']
-  y, fy = V(x, fx)
-  return R(x, fx, y, fy)
+  y, fy = sgoal['variation'](x, fx)
+  return sgoal['replace'](x, fx, y, fy)
 
 # Simple replace method: picks the best with neutral mutation
 def simplereplace(x, fx, y, fy, sgoal):
@@ -234,14 +369,43 @@ def simplereplace(x, fx, y, fy, sgoal):
 #   'variation': Variation operator. Wraps a variation operator if required (when it does not take into account SGOAL info)
 #   'replace': Replacement method. Set to simplereplace if not provided
 def VRSGoal(problem):
-  problem['next'] = lambda x, fx: next(x, fx, problem)
+  problem['next'] = problem['vrnext'] = lambda x, fx: next(x, fx, problem)
   if('replace' not in problem): problem['replace'] = lambda x,fx, y, fy : simplereplace(x, fx, y, fy, problem)
   if('variation' in problem and arity(problem['variation'])==1): 
     v = problem['variation']
-    problem['variation'] = lambda x, fx: variation11(x, fx, v, problem)
+    # variation11 inlined
+    def variation(x, fx):
+      y = v(x)
+      return y, problem['f'](y)
+    problem['variation'] = variation
   return SPSGoal(problem)
 
 ##################  POPULATION SGOAL ####################
+# Array population storage. If the 'array' key is set to True, the population is stored in a contiguous N x D array 
+# (of type 'dtype' given by the space, for instance bool for Binary and float64 for real spaces) and the objective 
+# function values in a float64 array. Spaces without a 'dtype' (or with the object dtype, for instance PackedBinary) 
+# store the candidate solutions as they are in an N object array. Generational SGoals double-buffer the population 
+# (see buffers)
+def isarray(sgoal): return 'array' in sgoal and sgoal['array']
+
+# Converts a population (and its objective function values) to array storage
+def arrayPop(P, fP, sgoal):
+  dtype = sgoal['dtype'] if 'dtype' in sgoal else object
+  if(dtype == object):
+    A = np.empty(len(P), dtype=object)
+    for i in range(len(P)): A[i] = P[i]
+  else: A = np.array(P, dtype=dtype).reshape(len(P), -1)
+  return A, np.array(fP, dtype=np.float64)
+
+# Gets the buffers for storing the next population (and its objective function values) of an array population.
+# The arrays of the current population become the buffers of the following population (double buffering)
+def buffers(P, fP, sgoal):
+  if('Q' not in sgoal or len(sgoal['Q']) < sgoal['N']): 
+    sgoal['Q'], sgoal['fQ'] = np.empty((sgoal['N'],)+P.shape[1:], dtype=P.dtype), np.empty(sgoal['N'])
+  Q, fQ = sgoal['Q'], sgoal['fQ']
+  sgoal['Q'], sgoal['fQ'] = P, fP
+  return Q, fQ
+
 # Trace population information
 def tracepop(fP, trace):
   if(trace!=None):
@@ -250,9 +414,50 @@ def tracepop(fP, trace):
 # Evaluates a population of candidate solutions
 def evalPop(P, f): return [f(x) for x in P]
 
+# Evaluates a population of candidate solutions using an executor (for instance a concurrent.futures.ProcessPoolExecutor).
+# The objective function must be picklable (a module level function or a functools.partial of it) if a process pool is used
+def executorPop(P, f, executor, chunksize=None):
+  if(chunksize==None): chunksize = max(1, len(P)//(4*(os.cpu_count() or 1)))
+  return list(executor.map(f, P, chunksize=chunksize))
+
+# Determines if the SGoal evaluates populations in batch mode (a single call evaluates a list of candidate solutions),
+# i.e., if a vectorized objective function or an executor is provided
+def batchmode(sgoal):
+  return 'fbatch' in sgoal or ('executor' in sgoal and sgoal['executor'] != None)
+
+# Computes (does not record) the objective function values of a population using the vectorized objective function 
+# (if provided) or the executor
+def objectivePop(P, sgoal):
+  if(len(P)==0): return []
+  if('fbatch' in sgoal): fP = sgoal['fbatch'](P)
+  else: fP = executorPop(P, sgoal['objective'], sgoal['executor'], sgoal['chunksize'] if 'chunksize' in sgoal else None)
+  return fP.tolist() if hasattr(fP, 'tolist') else list(fP)
+
+# Evaluates a population of candidate solutions using the vectorized objective function (if provided) or the 
+# executor (if provided), records the best and traced information of the whole batch in a single call.
+# Only the candidate solutions not in the evaluation cache (if provided) are evaluated
+def evalBatch(P, sgoal):
+  if(not batchmode(sgoal)): return evalPop(P, sgoal['f'])
+  cache = sgoal['cache']
+  if(cache == None):
+    fP = objectivePop(P, sgoal)
+    recPop(P, fP, sgoal)
+    return fP
+  keys = [genomekey(x) for x in P]
+  fP = [cacheget(key, cache) for key in keys]
+  miss = [i for i in range(len(P)) if fP[i] == None]
+  M = [P[i] for i in miss]
+  fM = objectivePop(M, sgoal)
+  for i, fx in zip(miss, fM):
+    fP[i] = fx
+    cacheput(keys[i], fx, cache)
+  if(cache['counthits']): recPop(P, fP, sgoal)
+  else: recPop(M, fM, sgoal)
+  return fP
+
 # Inits a population of candidate solutions
 def initPop(sgoal):
-  f, N, getN = sgoal['f'], sgoal['N'], sgoal['getN']
+  f, fpop, N, getN = sgoal['f'], sgoal['fpop'], sgoal['N'], sgoal['getN']
   if('start' in sgoal):
     start = sgoal['start']
     sgoal['best'] = start.copy()
@@ -263,22 +468,27 @@ def initPop(sgoal):
       xc = sgoal['complement'](x)
       fxc = f(xc)
       P = getN(N-2)
-      fP= evalPop(P, f)
+      fP= fpop(P)
       P.append(xc)
       fP.append(fxc)
     else:  
       P = getN(N-1)
-      fP= evalPop(P, f)
+      fP= fpop(P)
     P.append(x)
     fP.append(fx)
   else:
     P = getN(N)
-    fP= evalPop(P, f)
+    fP= fpop(P)
+  if(isarray(sgoal)): P, fP = arrayPop(P, fP, sgoal)
   sgoal['P'] = P
   sgoal['fP'] = fP
   return P, fP
 
 # Population Based SGOAL. Sets the population size to 128 and uses initPop as initPopulation method if not provided
+# Optional keys:
+#   'executor': Executor (for instance a concurrent.futures.ProcessPoolExecutor) used for evaluating the population
+#       (in batch mode). Bookkeeping (count, best, trace) is done in the main process in the population order
+#   'chunksize': Number of candidate solutions sent to a worker at once (if an executor is used)
 def PopSGoal(problem):
   if('N' not in problem): problem['N'] = 128
   if('init' not in problem): problem['init'] = lambda: initPop(problem)
@@ -300,4 +510,34 @@ def experiment(sgoal, problem, R=100):
   fx = [y['f'] for y in r]
   evals = [y['evals'] for y in r]
   sr = sum([1 if f==opt else 0 for f in fx]) / R
-  return fx, evals, sr
\ No newline at end of file
+  return fx, evals, sr
+
+# Runs the k-th repetition of an SGoal on the problem, seeding the random number generator with the run's seed.
+# Returns the best solution found, the optimum value (if available), and the run's wall time (in seconds)
+def runk(sgoal, problem, k, seed=0):
+  randseed(runseed(seed, k))
+  start = time.perf_counter()
+  p = problem(k)
+  opt = p['optimum'] if 'optimum' in p else None
+  best = run(sgoal(p))
+  return best, opt, time.perf_counter() - start
+
+# Runs an SGoal in parallel experiment mode. Runs R times the SGoal on the given problem (each run with its own
+# deterministic seed so results do not depend on the number of workers) and produces
+#   fx, evals, sr: Same as experiment
+#   times: An array with the wall time (in seconds) of each one of the R runs
+# sgoal and problem must be picklable (module level functions or functools.partial of them) if more than one worker is used.
+# executor: Executor used for running the experiment. If not provided, a process pool with workers processes is 
+#   used (runs in the current process if workers is set to 1)
+def pexperiment(sgoal, problem, R=100, seed=0, workers=None, executor=None):
+  args = ([sgoal]*R, [problem]*R, range(R), [seed]*R)
+  if(executor != None): r = list(executor.map(runk, *args))
+  elif(workers == 1): r = list(map(runk, *args))
+  else:
+    with ProcessPoolExecutor(workers) as pool:
+      r = list(pool.map(runk, *args))
+  fx = [y[0]['f'] for y in r]
+  evals = [y[0]['evals'] for y in r]
+  sr = sum([1 if r[k][0]['f']==r[k][1] else 0 for k in range(R)]) / R
+  times = [y[2] for y in r]
+  return fx, evals, sr, times
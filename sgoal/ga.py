@@ -19,6 +19,9 @@
 # HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) 
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 from sgoal.core import caneval
+from sgoal.core import batchmode
+from sgoal.core import isarray
+from sgoal.core import buffers
 from sgoal.core import randbool
 from sgoal.core import PopSGoal
 from sgoal.core import variation11
@@ -34,7 +37,7 @@ import random as rand
 ############### Genetic Algorithm - GA ################
 # problem: Problem to solve
 # config: GA Configuration
-#   selection: Selection Mechanism
+#   selection: Selection Mechanism (see sgoal.select, for instance min_vtournament(m) for tournaments of size m)
 #   mutation: Mutation operator
 #   xr: Crossover rate
 #   xover: Crossover operator
@@ -55,6 +58,7 @@ def GA(problem):
     problem['nextpair'] = lambda x, y : xovermutation(x, y, xover, mut, problem['xr'])
   np = problem['nextpair']
   if(arity(np)==2):
+    problem['pairvariation'] = np
     problem['nextpair'] = lambda x, fx, y, fy: variation22(x, fx, y, fy, np, problem)
   elif(arity(np)==5):
     problem['nextpair'] = lambda x, fx, y, fy: np(x, fx, y, fy, problem)
@@ -62,9 +66,38 @@ def GA(problem):
   return PopSGoal(problem)
 
 ############### Generational Genetic Algorithm - GGA ################
+# Batch version: generates all the offspring (as many as the evaluations budget allows) and evaluates them in a single call
+def nextGGABatch(P, fP, sgoal):
+  N, selection, pair = sgoal['N'], sgoal['selection'], sgoal['pairvariation']
+  idx1, idx2 = selection(fP, 2)
+  M = max(0, min(N//2, (sgoal['EVALS'] - sgoal['count'] + 1)//2))
+  Q = []
+  for i in range(M):
+    a, b = pair(P[idx1], P[idx2])
+    if(randbool()): a, b = b, a
+    Q.append(a)
+    Q.append(b)
+  fQ = sgoal['fpop'](Q)
+  if(isarray(sgoal)):
+    n = len(Q)
+    A, fA = buffers(P, fP, sgoal)
+    for i in range(n): A[i] = Q[i]
+    fA[:n] = fQ
+    return A[:n], fA[:n]
+  return Q, fQ
+
 def nextGGA(P, fP, sgoal):
+  if(batchmode(sgoal) and 'pairvariation' in sgoal): return nextGGABatch(P, fP, sgoal)
   N, selection, nextpair = sgoal['N'], sgoal['selection'], sgoal['nextpair']
   idx1, idx2 = selection(fP, 2)
+  if(isarray(sgoal)):
+    Q, fQ = buffers(P, fP, sgoal)
+    n = 0
+    for i in range(N//2):
+      if(caneval(sgoal)):
+        Q[n], fQ[n], Q[n+1], fQ[n+1] = nextpair(P[idx1], fP[idx1], P[idx2], fP[idx2])
+        n += 2
+    return Q[:n], fQ[:n]
   Q = []
   fQ = []
   for i in range(N//2):
@@ -91,7 +124,32 @@ def GGA_T(problem):
   return GA(problem)
 
 ############### Steady State Genetic Algorithm - GGA ################
+# Batch version: generates the offspring of all the pairs (as many as the evaluations budget allows) from the current 
+# population, evaluates them in a single call, and then applies the replacements in order. Parents are picked from the 
+# population at the beginning of the generation (not the steady state one), so it is used only if the 'batchpairs' key 
+# is set to True (in batch mode)
+def nextSSGABatch(P, fP, sgoal):
+  N, pair, pick = sgoal['N'], sgoal['pairvariation'], sgoal['pick']
+  M = max(0, min(N//2, (sgoal['EVALS'] - sgoal['count'] + 1)//2))
+  idx = []
+  Q = []
+  for i in range(M):
+    idx1, idx2 = rand.randint(0, N-1), rand.randint(0, N-1)
+    a, b = pair(P[idx1], P[idx2])
+    if(randbool()): a, b = b, a
+    idx.append(idx1)
+    idx.append(idx2)
+    Q.append(a)
+    Q.append(b)
+  fQ = sgoal['fpop'](Q)
+  for i in range(len(Q)):
+    k = idx[i]
+    P[k], fP[k], a, fa = pick(P[k], fP[k], Q[i], fQ[i])
+  return P, fP
+
 def nextSSGA(P, fP, sgoal):
+  if(batchmode(sgoal) and 'pairvariation' in sgoal and 'batchpairs' in sgoal and sgoal['batchpairs']): 
+    return nextSSGABatch(P, fP, sgoal)
   N, nextpair, pick = sgoal['N'], sgoal['nextpair'], sgoal['pick']
   for i in range(N//2):
     if(caneval(sgoal)):
@@ -109,6 +167,8 @@ def nextSSGA(P, fP, sgoal):
 #   xr: Crossover rate
 #   xover: Crossover operator
 #   N: Population's size (we set to the closest higher even number)
+#   batchpairs: If set to True (and a vectorized objective function or an executor is provided), generates and 
+#     evaluates the offspring of a whole generation at once (see nextSSGABatch)
 # initPop: Process for generating the initial population (by default uses the BitArraySpace generation method)
 # stop: Stopping criteria (by default uses the basic stopping criteria)
 def SSGA_T(problem):
@@ -21,15 +21,35 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 import random as rand
 from sgoal.core import caneval
+from sgoal.core import rec
+from sgoal.core import batchmode
+from sgoal.core import objectivePop
 from sgoal.core import SPSGoal
 from sgoal.util import permutation
 from sgoal.binary import multiflip
 from sgoal.binary import complement
 from sgoal.binary import flip
+from sgoal.binary import ispacked
 from sgoal.core import initPop
 from sgoal.core import evalPop
 from sgoal.core import init
+from array import array
 
+# Contribution information of D genes (loci) in bounded memory (fixed size arrays). A dictionary with keys
+#   'pos', 'neg': Highest positive contribution and highest (absolute value) negative contribution of each locus
+#   'tpos', 'tneg': Time (number of contributions recorded so far) when such highest contribution was first observed
+#   'nonzero': Number of non zero contributions of each locus
+#   'time': Number of contributions recorded so far
+def CONTRIBUTIONS(D):
+  return {'pos':array('d', [0.0])*D, 'neg':array('d', [0.0])*D, 'tpos':array('q', [0])*D, 'tneg':array('q', [0])*D,
+          'nonzero':array('q', [0])*D, 'time':0}
+
+# Records contribution c of locus k
+def addC(C, k, c):
+  C['time'] += 1
+  if(c!=0): C['nonzero'][k] += 1
+  if(c > C['pos'][k]): C['pos'][k], C['tpos'][k] = c, C['time']
+  elif(-c > C['neg'][k]): C['neg'][k], C['tneg'][k] = -c, C['time']
 
 # Computes contribution information (relative to a value 1), i.e., some change 
 # in the f value. Minimization version
@@ -41,7 +61,7 @@ from sgoal.core import init
 def min_C(x, fx, fy, k, sgoal):
   c = fy-fx
   if(x[k]==0): c = -c 
-  sgoal['C'][k].append(c)
+  addC(sgoal['C'], k, c)
   return c
 
 # Computes contribution information (relative to a value 1), i.e., some change 
@@ -54,11 +74,134 @@ def min_C(x, fx, fy, k, sgoal):
 def max_C(x, fx, fy, k, sgoal):
   c = fx-fy
   if(x[k]==0): c = -c 
-  sgoal['C'][k].append(c)
+  addC(sgoal['C'], k, c)
   return c
 
+############ In place (mutable genome) mode #############
+# If the problem has the 'iflip' and 'imultiflip' keys (in place variations, see sgoal.binary.iflip), GABO probes 
+# each flip on the candidate solution itself, and undoes it (without evaluating) if it is not kept, instead of 
+# creating a copy per probe. The candidate solution must not be the one recorded as the best one (see recmutable)
+def inplace(sgoal): return 'iflip' in sgoal and 'imultiflip' in sgoal
+
+# A candidate solution that can be modified in place
+def mutable(x, sgoal):
+  if('best' in sgoal and x is sgoal['best']['x']): return x.copy()
+  return x
+
+# Probes (in place) the flip of the k-th bit of x. Keeps the flip if it is picked, undoes it otherwise.
+# Records the contribution of the k-th bit and returns the f value of x, and the contribution
+def probe(x, fx, k, sgoal, C):
+  fy = sgoal['iflip'](x, fx, k)
+  if(sgoal['pick'](False, fx, True, fy)[0]): fx, fy = fy, fx
+  else: x[k] = 1 - x[k]
+  return fx, C(x, fx, fy, k, sgoal)
+
+# Evals contribution for each gene and gets the best according to improvements (in place version)
+def iallelesCheck(x, fx, sgoal):
+  if(sgoal['minimize']): C = min_C
+  else: C = max_C
+  x = mutable(x, sgoal)
+  P = permutation(len(x))
+  for k in P:
+    if(not caneval(sgoal)): return x, fx
+    fx, c = probe(x, fx, k, sgoal, C)
+  return x, fx
+
+# Intron Only Search Algorithm (in place version)
+def iIOSA(x, fx, sgoal):
+  intron, nonintron = sgoal['intron'], sgoal['nonintron']
+  if(sgoal['minimize']): C = min_C
+  else: C = max_C
+  x = mutable(x, sgoal)
+  N = len(intron)
+  rand.shuffle(intron)
+  i=0
+  while(i<N):
+    if(not caneval(sgoal)): return x, fx
+    k = intron[i] # Picks and analyzes one intron-like locus
+    fx, c = probe(x, fx, k, sgoal, C)
+    if( c != 0 ):
+      nonintron.append(k)
+      intron.pop(i)
+      N-=1
+    else:
+      i += 1
+  return x, fx
+
+# Coding Only Search Algorithm (in place version). Keeps x and its complement (in the coding genes) xc, so
+# flipping the k-th bit of both of them produces y and its complement yc
+def iCOSA( x, fx, sgoal ):
+  pick, coding = sgoal['pick'], sgoal['coding']
+  if(sgoal['minimize']): C = min_C
+  else: C = max_C
+
+  if(len(coding)==0 or not caneval(sgoal)): return x, fx
+
+  x = mutable(x, sgoal)
+  N = len(coding)
+  xc = x.copy()
+  fxc = sgoal['imultiflip'](xc, fx, coding)
+  if(pick(False, fx, True, fxc)[0]): x, fx, xc, fxc = xc, fxc, x, fx
+
+  # Considers locus by locus in a random fashion
+  perm = permutation(N)
+  for i in perm:
+    k = coding[i]
+    if(not caneval(sgoal)): return x, fx
+    fy = sgoal['iflip'](x, fx, k)
+    fyc = sgoal['iflip'](xc, fxc, k)
+    x[k] = 1 - x[k]
+    xc[k] = 1 - xc[k]
+    C(x, fx, fy, k, sgoal)
+    C(xc, fxc, fyc, k, sgoal)
+    x[k] = 1 - x[k]
+    xc[k] = 1 - xc[k]
+    # x and xc hold y and yc
+    swap, fw, l, fl = pick(False, fy, True, fyc)
+    if(pick(False, fx, True, fw)[0]):
+      if(swap): x, xc, fx, fxc = xc, x, fyc, fy
+      else: fx, fxc = fy, fyc
+    else:
+      x[k] = 1 - x[k]
+      xc[k] = 1 - xc[k]
+  x, fx = bestByContribution(x, fx, sgoal)
+  return x, fx
+
+############ Batch probes mode #############
+# Objective function values (not recorded) of a list of candidate solutions, computed in a single call of the 
+# vectorized objective function or the executor if provided (see sgoal.core.PopSGoal)
+def probes(Y, sgoal):
+  if(batchmode(sgoal)): return objectivePop(Y, sgoal)
+  f = sgoal['objective']
+  return [f(y) for y in Y]
+
+# Evals contribution for each gene and gets the best according to improvements (batch version). Computes the flips 
+# of the next 'batchprobes' genes (in the permutation order) of x at once and then walks them in order, recording 
+# each probe (see sgoal.core.rec) and accepting it if it is picked, as allelesCheck does. When a flip is accepted, the 
+# remaining probes of the batch (computed on the previous x) are discarded (not recorded) and computed again on the 
+# new x, so the search, the best solution and the evaluations count are the same as the ones of allelesCheck
+def ballelesCheck(x, fx, sgoal):
+  pick, B = sgoal['pick'], sgoal['batchprobes']
+  if(sgoal['minimize']): C = min_C
+  else: C = max_C
+  P = permutation(len(x))
+  i = 0
+  while(i<len(P) and caneval(sgoal)):
+    K = P[i:i+min(B, sgoal['EVALS'] - sgoal['count'])]
+    Y = [flip(x, k) for k in K]
+    fY = probes(Y, sgoal)
+    for j in range(len(K)):
+      i += 1
+      rec(Y[j], fY[j], sgoal)
+      x, fx, y, fy = pick(x, fx, Y[j], fY[j])
+      C(x, fx, fy, K[j], sgoal)
+      if(x is Y[j]): break
+  return x, fx
+
 # Evals contribution for each gene and gets the best according to improvements
 def allelesCheck(x, fx, sgoal):
+  if('batchprobes' in sgoal): return ballelesCheck(x, fx, sgoal)
+  if(inplace(sgoal)): return iallelesCheck(x, fx, sgoal)
   pick, flip = sgoal['pick'], sgoal['flip']
   if(sgoal['minimize']): C = min_C
   else: C = max_C
@@ -71,18 +214,15 @@ def allelesCheck(x, fx, sgoal):
     C(x, fx, fy, k, sgoal)
   return x, fx
 
-# Checks if a gene looks like intron
-def intronLike(C):
-  for k in C:
-    if(k!=0): return False
-  return True
+# Checks if a gene looks like intron (all its contributions are zero)
+def intronLike(C, k): return C['nonzero'][k]==0
 
 # Splits genes into intron like and coding like genes according to computed contributions
 def split(C):
   intron = []
   coding = []
-  for k in range(len(C)):
-    if(intronLike(C[k])): intron.append(k)
+  for k in range(len(C['nonzero'])):
+    if(intronLike(C, k)): intron.append(k)
     else: coding.append(k)
   return intron, coding
 
@@ -94,6 +234,7 @@ def ICSplit(x, fx, sgoal):
 
 # Intron Only Search Algorithm
 def IOSA(x, fx, sgoal):
+  if(inplace(sgoal)): return iIOSA(x, fx, sgoal)
   pick, flip, intron, nonintron = sgoal['pick'], sgoal['flip'], sgoal['intron'], sgoal['nonintron']
   if(sgoal['minimize']): C = min_C
   else: C = max_C
@@ -118,11 +259,10 @@ def IOSA(x, fx, sgoal):
 # k: Locus (gene's position)
 # b: Current value of the gene (allele)
 def bestAllele(k, b, C):
-  a, c = b, 0
-  for ci in C[k]:
-    if(ci>c): a, c = 1, ci
-    elif(-ci>c): a, c =  0, -ci
-  return a
+  pos, neg = C['pos'][k], C['neg'][k]
+  if(pos > neg or (pos == neg and pos > 0 and C['tpos'][k] < C['tneg'][k])): return 1
+  if(neg > 0): return 0
+  return b
 
 # Generates a candidate solution with the alleles in the value having the highest contribution
 def bestAlleles(x, sgoal):
@@ -144,6 +284,7 @@ def bestByContribution(x, fx, sgoal):
   
 # Coding Only Search Algorithm
 def COSA( x, fx, sgoal ):
+  if(inplace(sgoal)): return iCOSA(x, fx, sgoal)
   pick, flip, multiflip, coding = sgoal['pick'], sgoal['flip'], sgoal['multiflip'], sgoal['coding']
   if(sgoal['minimize']): C = min_C
   else: C = max_C
@@ -198,16 +339,25 @@ def mflip(x, fx, k, sgoal):
   fy = sgoal['f'](y)
   return y, fy
 
+# Checks that the problem does not use packed BitArrays (GABO and ACIA index and flip the bits of the genome)
+def checkunpacked(problem, name):
+  if(ispacked(problem)):
+    raise ValueError(name+" requires unpacked BitArrays (use TestProblem(..., PACKED=False) or a Binary space)")
+
 # GABO Algorithm Configuration. Extends a Binary Problem with the follwoing keys
-#   'C': Contribution information (A vector with all alleles computed contributions) 
+#   'C': Contribution information (see CONTRIBUTIONS) 
 #   'intron': Array with intron like allele indices
 #   'nonintron': Array with non-intron like allele indices according to IOSA
 #   'coding': Array with coding allele indices
-#   'flip': Bit flip method --> variation form (by default sets sflip)
-#   'flip': MultiBit flip method --> variation form (by default sets mflip)
+#   'flip': Bit flip method --> variation form (by default sets sflip, see sgoal.binary.dflip for incremental evaluation)
+#   'multiflip': MultiBit flip method --> variation form (by default sets mflip, see sgoal.binary.dmultiflip)
+#   'iflip', 'imultiflip': Optional in place versions of flip and multiflip (see inplace)
+#   'batchprobes': Optional number of single bit flips probed at once by allelesCheck (see ballelesCheck)
+# GABO works on (unpacked) BitArrays, packed BitArrays (see sgoal.binary.PackedBinary) are not supported
 def GABOConfig(problem):
+  checkunpacked(problem, 'GABO')
   D = problem['D']
-  problem['C'] = [[] for k in range(D)]
+  problem['C'] = CONTRIBUTIONS(D)
   problem['intron'] = [k for k in range(D)]
   problem['nonintron'] = []
   problem['coding'] = []
@@ -242,10 +392,11 @@ def nextACIA( x, fx, sgoal ):
     sgoal['best']['evals'] = sgoal['count']
   return x, fx
 
-# ACIA
+# ACIA (packed BitArrays are not supported)
 def ACIA(problem):
+  checkunpacked(problem, 'ACIA')
   D = problem['D']
-  problem['C'] = [[] for k in range(D)]
+  problem['C'] = CONTRIBUTIONS(D)
   if('flip' not in problem): problem['flip'] = lambda x, fx, k: sflip(x, fx, k, problem)
   if('multiflip' not in problem): problem['multiflip'] = lambda x, fx, k: mflip(x, fx, k, problem)
   problem['next'] = lambda x, fx: nextACIA(x, fx, problem)
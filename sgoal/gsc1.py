@@ -25,8 +25,8 @@
 # (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
 # HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) 
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+import numpy as np
 from sgoal.core import VRSGoal
-from sgoal.core import evalPop
 from sgoal.binary import complement
 
 
@@ -38,33 +38,41 @@ from sgoal.binary import complement
 # July 1991 (R. K. Belew and L. B. Booker, eds.), pp. 166– 173, Morgan Kaufmann, 1991.
 # Our generalization allows to check a good 1-schema after some CHECK evaluations
 # instead of checing it at the end of the allowed number of fitness evaluations
+# The sampled candidate solutions are generated and evaluated in chunks of 'chunk' candidate solutions (4096 by 
+# default, see sgoal.core.PopSGoal for vectorized/parallel population evaluation) and folded into the schemata 
+# statistics, so memory does not depend on the number of evaluations
 # f: Function to be optimized
 def variationGS1(x, fx, sgoal):
-  f, getN, minimize = sgoal['f'], sgoal['getN'], sgoal['minimize']
-  
+  f, fpop, getN, minimize = sgoal['f'], sgoal['fpop'], sgoal['getN'], sgoal['minimize']
+  chunk = sgoal['chunk'] if 'chunk' in sgoal else 4096
+  D = sgoal['D']
+
+  # Computes schemata information: fH1[k] (C1[k]) is the sum of f values (number) of the candidate solutions with 
+  # a 1 in the k-th gene. The same information for 0 is obtained from the totals (fT and M)
+  fH1 = np.zeros(D)
+  C1 = np.zeros(D)
+  fT = 0.0
+  M = 0
+  S, fS = [x], [fx]
   N = sgoal['EVALS'] - 1
-  S1 = getN(N)
-  fS1 = evalPop(S1, f)
-  S1.append(x)
-  fS1.append(fx)
+  while(True):
+    X = np.asarray(S, dtype=bool).reshape(len(S), D)
+    fS = np.asarray(fS, dtype=np.float64)
+    fH1 += fS @ X
+    C1 += X.sum(0)
+    fT += fS.sum()
+    M += len(S)
+    if(N<=0): break
+    S = getN(min(chunk, N))
+    N -= len(S)
+    fS = fpop(S)
+  fH0, C0 = fT - fH1, M - C1
 
-# Computes schemata information
-  M = len(S1)
-  D = sgoal['D']
-  C = [[0 for k in range(D)], [0 for k in range(D)]]
-  fH = [[0 for k in range(D)], [0 for k in range(D)]]
-  for k in range(D):
-    for i in range(M):
-      fH[S1[i][k]][k] += fS1[i]
-      C[S1[i][k]][k] += 1
   # Generates a candidate solution with the best genes
-  y = []
-  if( minimize ):
-    for k in range(D):
-      y.append( 1 if(fH[1][k]/C[1][k] < fH[0][k]/C[0][k]) else 0 )
-  else:
-    for k in range(D):
-      y.append( 1 if(fH[1][k]/C[1][k] > fH[0][k]/C[0][k]) else 0 )
+  with np.errstate(divide='ignore', invalid='ignore'):
+    if( minimize ): y = fH1/C1 < fH0/C0
+    else: y = fH1/C1 > fH0/C0
+  y = y.astype(int).tolist()
   fy = f(y)
   return y, fy
 
@@ -1,7 +1,13 @@
-import pandas as pd
+import os
+import heapq
+import tempfile
 import random as rand
+import numpy as np
+from functools import partial
 from sgoal.core import randbool
+from sgoal.util import randindices
 from sgoal.core import rec
+from sgoal.core import recmutable
 from sgoal.binary import Binary
 from sgoal.binary import flip
 from sgoal.binary import multiflip
@@ -17,13 +23,19 @@ from sgoal.chavela import apply
 from sgoal.chavela import CHAVELA_T
 from sgoal.chavela import CHAVELA1_T
 
-# Read a maxcut problem matrix
+# Read a maxcut problem matrix (pandas is required, it is imported only when reading from a url)
 def read(D, url):
+  import pandas as pd
+  data = pd.read_csv(url, sep=' ', skiprows=1, header=None, names=None)
+  return relations(D, data.values)
+
+# Builds the adjacency lists (REL), their weights (WREL), and the edge list (W) of a graph with D vertices 
+# from its edges (rows [a,b,w] with vertices numbered from 1, as in G data set files)
+def relations(D, E):
   REL = [[] for i in range(D)]
   WREL = [[] for i in range(D)]
   W = []
-  data = pd.read_csv(url, sep=' ', skiprows=1, header=None, names=None)
-  for w in data.values:
+  for w in E:
     a = w[0]-1
     b = w[1]-1 
     REL[a].append(b)
@@ -33,6 +45,37 @@ def read(D, url):
     W.append([a,b,w[2]])
   return REL, WREL, W
 
+# Parses a maxcut problem file (first line: number of vertices and edges, then one 'a b w' line per edge).
+# Returns the number of vertices and an E x 3 array with the edges
+def parse(path):
+  with open(path, 'rb') as file: data = np.array(file.read().split(), dtype=np.int64)
+  return int(data[0]), data[2:].reshape(-1, 3)
+
+# Loads the edges of a maxcut problem file using a binary cache (path.npy, created next to the file if it does not
+# exist or it is older than the file). The cache is written to a temporary file and then moved into place, so 
+# concurrent loads never see a partial cache, and it is memory mapped. If the cache cannot be written (for instance,
+# a read only directory) the parsed edges are used. Returns the number of vertices and the edges (an E x 3 array)
+def load(path):
+  cache = path + '.npy'
+  if(not os.path.exists(cache) or os.path.getmtime(cache) < os.path.getmtime(path)):
+    D, E = parse(path)
+    try:
+      fd, tmp = tempfile.mkstemp(suffix='.npy', dir=os.path.dirname(os.path.abspath(path)))
+    except OSError: return D, E
+    try:
+      with os.fdopen(fd, 'wb') as file: np.save(file, np.vstack(([D, len(E), 0], E)))
+      os.replace(tmp, cache)
+    except OSError:
+      if(os.path.exists(tmp)): os.remove(tmp)
+      return D, E
+  data = np.load(cache, mmap_mode='r')
+  return int(data[0,0]), data[1:]
+
+# Read a maxcut problem matrix from a local file (see load)
+def readfile(path):
+  D, E = load(path)
+  return relations(D, E.tolist())
+
 ########## Standard version of maxcut problem ##########
 # Standard function evaluation
 def maxcut(x, W):
@@ -42,23 +85,74 @@ def maxcut(x, W):
       s += w[2]
   return s
 
-# Standard Maxcut Problem
-def MaxCutProblem(REL, WREL, W, EVALS):
+########## Compressed sparse row (CSR) graph ##########
+# A graph with D vertices stored in compressed sparse row form (numpy arrays):
+#   'D': Number of vertices
+#   'indptr': The neighbours of vertex i are indices[indptr[i]:indptr[i+1]] (with weights weights[indptr[i]:indptr[i+1]])
+#   'indices', 'weights': Neighbours and weights of the adjacency lists (each edge appears in both directions)
+#   'A', 'B', 'W': Edge list (each edge appears once): edge e goes from A[e] to B[e] with weight W[e]
+# W: Edge list ([a,b,w] triplets, as returned by read)
+def CSR(D, W):
+  E = np.asarray(W).reshape(-1, 3)
+  A, B = E[:,0].astype(np.int64), E[:,1].astype(np.int64)
+  Wt = E[:,2]
+  src = np.concatenate((A, B))
+  order = np.argsort(src, kind='stable')
+  indptr = np.zeros(D+1, dtype=np.int64)
+  np.cumsum(np.bincount(src, minlength=D), out=indptr[1:])
+  return {'D':D, 'indptr':indptr, 'indices':np.concatenate((B, A))[order], 'weights':np.concatenate((Wt, Wt))[order],
+          'A':A, 'B':B, 'W':Wt}
+
+# Vectorized maxcut function: Computes the cut value of a candidate solution x (a BitArray) or of each row of a 
+# population matrix x (an N x D array or a list of BitArrays)
+def csrmaxcut(x, G):
+  X = np.asarray(x)
+  A, B, W = G['A'], G['B'], G['W']
+  if(X.ndim == 1): return W[X[A] != X[B]].sum().item()
+  return (X[:,A] != X[:,B]) @ W
+
+# Vectorized change in the cut value when the vertices in the indices array k of x are flipped (y is the 
+# flipped candidate solution)
+def csrdelta(y, k, x, G):
+  X, Y, K = np.asarray(x), np.asarray(y), np.asarray(k, dtype=np.int64)
+  indptr = G['indptr']
+  start = indptr[K]
+  count = indptr[K+1] - start
+  pos = np.arange(count.sum()) + np.repeat(start - (np.cumsum(count) - count), count)
+  i, r, w = np.repeat(K, count), G['indices'][pos], G['weights'][pos]
+  keep = X[r] == Y[r]
+  return (w[keep] * np.where(X[i[keep]] == X[r[keep]], 1, -1)).sum().item()
+
+# Standard Maxcut Problem. The cut value is computed with the CSR graph (key 'CSR') of the problem
+# (a functools.partial, so it can be sent to a process pool, see 'executor' in sgoal.core.PopSGoal)
+# BATCH: Provides the population version of the maxcut function as vectorized objective function if set to True
+def MaxCutProblem(REL, WREL, W, EVALS, BATCH=False):
   D = len(REL)
   space = Binary(D)
-  problem = PROBLEM('max', lambda x: maxcut(x,W), space, EVALS)
+  G = CSR(D, W)
+  fbatch = partial(csrmaxcut, G=G) if BATCH else None
+  problem = PROBLEM('max', partial(csrmaxcut, G=G), space, EVALS, fbatch=fbatch)
   problem['REL'] = REL
   problem['WREL'] = WREL
   problem['W'] = W
+  problem['CSR'] = G
   return problem
 
 
 ########## Fast version of maxcut problem ##########
+# Number of flipped vertices from which the delta is computed with the (vectorized) CSR graph for BitArrays stored 
+# as lists (it is always used for numpy arrays)
+CSRDELTA = 32
+
 def fastmaxcut(y, k, x, fx, sgoal):
   REL, WREL, M = sgoal['REL'], sgoal['WREL'], len(sgoal['W'])
   count = 0
   n = len(x)
   if(len(k)==n or len(k)==0): return fx
+  if('CSR' in sgoal and (isinstance(x, np.ndarray) or len(k) >= CSRDELTA)):
+    f = fx + csrdelta(y, k, x, sgoal['CSR'])
+    rec(y, f, sgoal)
+    return f
   delta = 0
   for i in k:
     if(x[i]==y[i]): print('what')
@@ -86,6 +180,25 @@ def mflip(x, fx, k, sgoal):
   fy = fastmaxcut(y, k, x, fx, sgoal)
   return y, fy
 
+# In place flip of the vertices in k (mutable genome, see sgoal.gabo) with incremental evaluation. 
+# Returns the new f value of x
+def imflip(x, fx, k, sgoal):
+  n = len(x)
+  if(len(k)==0 or len(k)==n):
+    for i in range(n): x[i] = 1 - x[i]
+    return fx
+  REL, WREL = sgoal['REL'], sgoal['WREL']
+  K = set(k)
+  delta = 0
+  for i in k:
+    for j in range(len(REL[i])):
+      r = REL[i][j]
+      if(r not in K): delta += WREL[i][j] if x[i]==x[r] else -WREL[i][j]
+  for i in k: x[i] = 1 - x[i]
+  fx += delta
+  recmutable(x, fx, sgoal)
+  return fx
+
 def singlebitmutation(x, fx, sgoal):
   k = rand.randint(0,len(x)-1)
   y = flip(x, k)
@@ -93,10 +206,7 @@ def singlebitmutation(x, fx, sgoal):
   return y, fy
 
 def bitmutationprob(x, fx, p, sgoal):
-  k = []
-  for i in range(len(x)):
-    if(randbool(p)):
-      k.append(i)
+  k = randindices(len(x), p)
   if(len(k)>0): y = multiflip(x, k)
   else: y = x.copy()
   fy = fastmaxcut(y, k, x, fx, sgoal)
@@ -164,11 +274,122 @@ def transposition( x, fx, sgoal ):
   return y, fy
 
 
+########## Gain table local search ##########
+# Gain table of a candidate solution x: a dictionary with keys
+#   'x': The candidate solution (a copy of x, modified by each flip)
+#   'gain': gain[v] is the change in the cut value if vertex v is flipped
+#   'heap': Heap of (-gain, v) pairs (lazy deletion: a pair is valid only if it matches the current gain of v), 
+#       so the vertex with the highest gain is obtained in O(log D)
+#   'adj': CSR graph as lists (indptr, indices, weights) for O(deg(v)) updates
+def gaintable(x, G):
+  if('lists' not in G): G['lists'] = (G['indptr'].tolist(), G['indices'].tolist(), G['weights'].tolist())
+  X = np.asarray(x)
+  indptr, indices, weights = G['indptr'], G['indices'], G['weights']
+  D = G['D']
+  i = np.repeat(np.arange(D), np.diff(indptr))
+  gain = np.bincount(i, weights=np.where(X[i]==X[indices], weights, -weights), minlength=D)
+  gain = gain.astype(weights.dtype).tolist()
+  heap = [(-gain[v], v) for v in range(D)]
+  heapq.heapify(heap)
+  return {'x':x.copy(), 'gain':gain, 'heap':heap, 'adj':G['lists']}
+
+# Flips vertex v updating the gains of v and its neighbours (O(deg(v) log D))
+def gainflip(T, v):
+  x, gain, heap = T['x'], T['gain'], T['heap']
+  indptr, indices, weights = T['adj']
+  x[v] = 1 - x[v]
+  gain[v] = -gain[v]
+  heapq.heappush(heap, (-gain[v], v))
+  for j in range(indptr[v], indptr[v+1]):
+    r = indices[j]
+    gain[r] += 2*weights[j] if x[v]==x[r] else -2*weights[j]
+    heapq.heappush(heap, (-gain[r], r))
+  if(len(heap) > 4*len(gain)): 
+    T['heap'] = heap = [(-gain[u], u) for u in range(len(gain))]
+    heapq.heapify(heap)
+
+# Vertex with the highest gain that is not tabu (tabu[v] > it) unless its gain is higher than aspiration
+# Returns None if there is no such vertex
+def bestgain(T, tabu=None, it=0, aspiration=0):
+  gain, heap = T['gain'], T['heap']
+  skipped = []
+  v = None
+  while(len(heap)>0):
+    g, u = heap[0]
+    if(-g != gain[u]): heapq.heappop(heap)
+    elif(tabu!=None and tabu[u] > it and -g <= aspiration): skipped.append(heapq.heappop(heap))
+    else: 
+      v = u
+      break
+  for e in skipped: heapq.heappush(heap, e)
+  return v
+
+# Gain table of candidate solution x for a local search. Reuses the table of the previous local search (key 'gains') 
+# if x is the solution it returned, or its starting solution (undoing its flips), builds it otherwise
+def gainsof(x, sgoal):
+  T = sgoal['gains'] if 'gains' in sgoal else None
+  if(T!=None and x is T['start']):
+    for v in reversed(T['trail']): gainflip(T, v)
+  elif(T==None or x is not T['y']): T = sgoal['gains'] = gaintable(x, sgoal['CSR'])
+  T['start'], T['trail'] = x, []
+  return T
+
+# Gain table local search -> variation form. Flips the vertices in k (perturbation) and then performs a local search.
+# Each flip counts as a function evaluation. If the problem has no 'tenure' key (or it is 0) performs a 1-opt 
+# (steepest ascent) local search up to a local optimum, otherwise performs a tabu search ('tabumoves' flips, the 
+# number of vertices by default) where a flipped vertex cannot be flipped in the following 'tenure' flips unless it 
+# improves the best cut found. Returns the best candidate solution found (after the perturbation)
+def localsearch(x, fx, sgoal, k=[]):
+  T = gainsof(x, sgoal)
+  tenure = sgoal['tenure'] if 'tenure' in sgoal else 0
+  moves = sgoal['tabumoves'] if tenure>0 and 'tabumoves' in sgoal else len(x)
+  if(tenure==0): moves = len(x)*len(x)
+  budget = max(0, sgoal['EVALS'] - sgoal['count'])
+  k = k[:budget]
+  moves = min(budget, len(k) + max(1, moves))
+  tabu = [0]*len(x) if tenure>0 else None
+  gain, trail = T['gain'], T['trail']
+  f = fx
+  for v in k:
+    f += gain[v]
+    gainflip(T, v)
+    trail.append(v)
+  fbest, best = f, len(trail)
+  while(len(trail) < moves):
+    v = bestgain(T, tabu, len(trail), fbest - f)
+    if(v==None or (tenure==0 and gain[v] <= 0)): break
+    f += gain[v]
+    gainflip(T, v)
+    trail.append(v)
+    if(tenure>0): tabu[v] = len(trail) + tenure
+    if(f > fbest): fbest, best = f, len(trail)
+  count = len(trail)
+  while(len(trail) > best): gainflip(T, trail.pop())
+  y = T['y'] = T['x'].copy()
+  delta = sgoal['delta']
+  sgoal['delta'] = max(min(1, budget), count)
+  rec(y, fbest, sgoal)
+  sgoal['delta'] = delta
+  return y, fbest
+
+# Sets the gain table local search (see localsearch) as the 'localsearch' key of the problem
+# tenure: Tabu tenure (1-opt local search if 0)
+def setlocalsearch(problem, tenure=0):
+  problem['tenure'] = tenure
+  problem['localsearch'] = lambda x, fx, k=[]: localsearch(x, fx, problem, k)
+  return problem
+
 ##################### SGOALs ###########################
-# Classical Hill Climbing Algorithm with neutral mutation for BitArray problems. Uses bitmutation as variation operator
+# Classical Hill Climbing Algorithm with neutral mutation for BitArray problems. Uses bitmutation as variation operator.
+# If the problem has a 'localsearch' key (see setlocalsearch), it is an iterated local search: the bits to mutate are
+# flipped and then the local search is applied
 # problem: Problem to solve
 def HC(problem): 
-  if( 'variation' not in problem ): problem['variation'] = bitmutation 
+  if( 'variation' not in problem ): 
+    if('localsearch' in problem): 
+      ls = problem['localsearch']
+      problem['variation'] = lambda x, fx: ls(x, fx, randindices(len(x), 1/len(x)))
+    else: problem['variation'] = lambda x, fx: bitmutation(x, fx, problem)
   return VRSGoal(problem)
 
 # The HC algorithm suggested by Richard Palmer, that Forrest and
@@ -210,12 +431,15 @@ def GGA(problem):
 def SSGA(problem):
   return SSGA_T(bmutation(problem))
 
-# Standard CHAVELA for Binary problems. Uses bitmutation, simplexover, and transposition as operators
+# Standard CHAVELA for Binary problems. Uses bitmutation, simplexover, and transposition as operators 
+# (and the local search of the 'localsearch' key, if provided)
 def CHAVELA(problem):
   mutation = lambda x, fx: bitmutation(x, fx, problem)
   xover = lambda x, fx: simplexover1(x, fx, problem)
   transp = lambda x, fx: transposition( x, fx, problem)
-  if( 'operators' not in problem ): problem['operators'] = [mutation, transp, xover]
+  if( 'operators' not in problem ): 
+    problem['operators'] = [mutation, transp, xover]
+    if('localsearch' in problem): problem['operators'].append(problem['localsearch'])
   return CHAVELA_T(problem)
 
 # Standard CHAVELA1 for Binary problems
@@ -225,16 +449,20 @@ def CHAVELA(problem):
 
 
 
-def FastMaxCutProblem(REL, WREL, W, EVALS):
-  problem = MaxCutProblem(REL, WREL, W, EVALS)
+def FastMaxCutProblem(REL, WREL, W, EVALS, BATCH=False):
+  problem = MaxCutProblem(REL, WREL, W, EVALS, BATCH)
   problem['flip'] = lambda x, fx, k: sflip(x, fx, k, problem)
   problem['multiflip'] = lambda x, fx, k: mflip(x, fx, k, problem)
+  problem['iflip'] = lambda x, fx, k: imflip(x, fx, [k], problem)
+  problem['imultiflip'] = lambda x, fx, k: imflip(x, fx, k, problem)
   return problem
 
 ########### Test bed #############
 ### G data set from https://web.stanford.edu/~yyye/yyye/Gset/ 
-# Read a maxcut problem matrix from the G data set 
-def readG(T):
+# Read a maxcut problem matrix from the G data set. Reads the local file dir/GT (see readfile) if a directory is 
+# given, downloads it otherwise
+def readG(T, dir=None):
+  if(dir!=None): return readfile(os.path.join(dir, 'G' + str(T)))
   return read(Gdimension(T), 'https://web.stanford.edu/~yyye/yyye/Gset/G' + str(T))
 
 def Gdimension(T):
@@ -19,7 +19,12 @@
 
 import math
 import random as rand
+import numpy as np
+from functools import partial
+from collections import OrderedDict
 from sgoal.core import randbool
+from sgoal.core import rec
+from sgoal.core import refresh
 from sgoal.core import SPACE
 from sgoal.core import PROBLEM
 from sgoal.core import simplegetN
@@ -27,8 +32,10 @@ from sgoal.core import VRSGoal
 from sgoal.core import variation11
 from sgoal.core import transposition
 from sgoal.core import simplexover
+from sgoal.real1 import sphere_1
 from sgoal.real1 import rastrigin_1
 from sgoal.real1 import schwefel_1
+from sgoal.util import randindices
 from sgoal.es import Rule1_5_T
 from sgoal.ga import SSGA_T
 from sgoal.ga import GGA_T
@@ -49,28 +56,32 @@ def HyperRectangle(min, max, g=None, gn=None, feasible=None):
   length = [max[i]-min[i] for i in range(len(min))]
   if(g==None): g = lambda: [min[i] + rand.random()*length[i] for i in range(len(min))]
   if(gn==None): gn = lambda N: simplegetN(N,g)
-  if(feasible==None): feasible = lambda x: feasibleRn(min, max, x)
+  if(feasible==None): feasible = partial(feasibleRn, min, max)
   space = SPACE(g, gn, feasible)
   space['D'] = len(min)
   space['hyperrectangle'] = [min, max, length]
+  space['dtype'] = np.float64
   return space
 
 def HyperCube(min, max, D, g=None, gn=None, feasible=None):
   return HyperRectangle([min for i in range(D)], [max for i in range(D)], g, gn, feasible)
 
 ############# Variations ##############
-# N-Dimensional Gaussian mutation
-def hyperGaussianSigmaProb(x, sigma, feasible, p):
+# N-Dimensional Gaussian mutation. Each coordinate is changed with probability p (the changed coordinates are 
+# drawn directly, see randindices). Returns the mutated vector and the indices of the changed coordinates
+def hypergaussianchanges(x, sigma, feasible, p):
   y = x.copy()
-  for i in range(len(y)):
-     if(randbool(p)):
-        y[i] += rand.gauss(0, sigma[i])
-  return y if feasible(y) else x
+  k = randindices(len(y), p)
+  for i in k:
+    y[i] += rand.gauss(0, sigma[i])
+  return (y, k) if feasible(y) else (x, [])
+
+def hyperGaussianSigmaProb(x, sigma, feasible, p): return hypergaussianchanges(x, sigma, feasible, p)[0]
 
 def hypergaussiansigma(x, sigma, feasible):
   return hyperGaussianSigmaProb(x, sigma, feasible, 1.0/len(x))
 
-def hypergaussian(sigma, feasible): return lambda x: hypergaussiansigma(x, sigma, feasible)
+def hypergaussian(sigma, feasible): return partial(hypergaussiansigma, sigma=sigma, feasible=feasible)
 
 def hypergaussianmutation(problem):
   if( 'hyperrectangle' in problem):
@@ -87,6 +98,13 @@ def gaussianmutation(sgoal):
   if('mutation' not in sgoal): sgoal['mutation'] = hypergaussianmutation(sgoal)
   return sgoal
 
+# Gaussian mutation -> variation form. Uses incremental evaluation (see realdelta) if the problem provides it
+def gaussianvariation(problem):
+  mutation = hypergaussianmutation(problem)
+  if(not isincremental(problem)): return lambda x, fx: variation11(x, fx, mutation, problem)
+  sigma, feasible = problem['sigma'], problem['feasible']
+  return lambda x, fx: dgaussianmutation(x, fx, sigma, feasible, problem)
+
 # N-Dimensional Uniform mutation
 def hyperUniformProb(x, min, length, feasible, p):
   y = x.copy()
@@ -98,7 +116,7 @@ def hyperUniformProb(x, min, length, feasible, p):
 def hyperUniform(x, min, length, feasible):
   return hyperUniformProb(x, min, length, feasible, 1.0/len(x))
 
-def hyperuniform(min, length, feasible): return lambda x: hyperUniform(x, min, length, feasible)
+def hyperuniform(min, length, feasible): return partial(hyperUniform, min=min, length=length, feasible=feasible)
 
 def hyperuniformmutation(problem):
   L = problem['hyperrectangle'][2].copy()
@@ -114,7 +132,9 @@ def uniformmutation(sgoal):
 # Classical Hill Climbing Algorithm for Real problems. Uses Gaussian mutation with sigma=0.2 as variation operator
 # problem: Problem to solve
 def HC(problem): 
-  if( 'variation' not in problem ): problem['variation'] = hypergaussianmutation(problem)
+  if( 'variation' not in problem ): 
+    if(isincremental(problem)): problem['variation'] = gaussianvariation(problem)
+    else: problem['variation'] = hypergaussianmutation(problem)
   return VRSGoal(problem) 
 
 # 1+1 Evolutionary Strategy (Hill Climbing) with neutral mutations and 1/5th rule, see
@@ -126,7 +146,7 @@ def scalesigma( problem ):
   sigma = problem['sigma']
   sigma = [s*v for s in sigma]
   problem['sigma'] = sigma
-  problem['variation'] = lambda x, fx: variation11(x, fx, hypergaussianmutation(problem), problem)
+  problem['variation'] = gaussianvariation(problem)
 
 # 1+1 Evolutionary Strategy (Hill Climbing) with neutral mutations and 1/5th rule
 def Rule1_5(problem):
@@ -134,25 +154,29 @@ def Rule1_5(problem):
   if( 'parameter' not in problem ): problem['parameter'] = 1
   if( 'variation' not in problem ): 
     problem['scaleparameter'] = lambda : scalesigma(problem)
-    problem['variation'] = hypergaussianmutation(problem)
+    if(isincremental(problem)): problem['variation'] = gaussianvariation(problem)
+    else: problem['variation'] = hypergaussianmutation(problem)
   if( 'G' not in problem ): problem['G'] = D
   return Rule1_5_T(problem)
 
 ############## Generational Genetic Algorithm - SSGA ################
 def GGA(problem):
-  return GGA_T(gaussianmutation(problem))
+  return GGA_T(gaussianmutation(dxover(problem)))
 
 ############### Steady State Genetic Algorithm - SSGA ################
 # problem: Problem to solve
 def SSGA(problem):
-  return SSGA_T(gaussianmutation(problem))
+  return SSGA_T(gaussianmutation(dxover(problem)))
 
 # Standard CHAVELA for Real problems. Uses gaussianmutation, simplexover, and transposition as operators
 def CHAVELA(problem):
-  mutation = lambda x, fx: apply(hypergaussianmutation(problem), x, fx, problem)
+  if(isincremental(problem)): mutation = gaussianvariation(problem)
+  else: mutation = lambda x, fx: apply(hypergaussianmutation(problem), x, fx, problem)
   xover = lambda x, fx: apply(simplexover, x, fx, problem)
   transp = lambda x, fx: apply(transposition, x, fx, problem)
-  if( 'operators' not in problem ): problem['operators'] = [mutation, xover, transp]
+  if( 'operators' not in problem ): 
+    problem['operators'] = [mutation, xover, transp]
+    problem['variations'] = [hypergaussianmutation(problem), simplexover, transposition]
 
   if( 'operators' not in problem ): problem['operators'] = [hypergaussianmutation(problem), transposition, simplexover]
   #if( 'operators' not in problem ): problem['operators'] = [hypergaussianmutation(problem), hyperuniformmutation(problem), simplexover]
@@ -214,14 +238,180 @@ def ackley( x ):
     q += math.cos(c*y)
   return s-a*math.exp(-b*(p/D)**0.5) - math.exp(q/D)
 
+#################### TEST FUNCTIONS (POPULATION VERSIONS) ##############
+# Population versions of the test functions: compute the function on each row of an N x D population matrix 
+# (a list of real vectors or a 2D array) at once. Return an array of N values
+# Population matrix (N x D array of floats) of a list of real vectors
+def popmatrix(P): return np.asarray(P, dtype=np.float64).reshape(len(P), -1)
+
+# Sphere function
+def spherePop(P):
+  X = popmatrix(P)
+  return (X*X).sum(1)
+
+# Rastrigin function
+def rastriginPop(P):
+  X = popmatrix(P)
+  return 10.0*X.shape[1] + (X*X - 10.0*np.cos(2.0*math.pi*X)).sum(1)
+
+# Schwefel Function
+def schwefelPop(P):
+  X = popmatrix(P)
+  return 418.9829101*X.shape[1] - (X*np.sin(np.sqrt(np.abs(X)))).sum(1)
+
+# Griewangk function
+def griewankPop(P):
+  X = popmatrix(P)
+  return 1.0 + (X*X/4000.0).sum(1) - np.cos(X/np.sqrt(np.arange(1.0, X.shape[1]+1.0))).prod(1)
+
+# Rosenbrock Saddle Function
+def rosenbrock_saddlePop(P):
+  X = popmatrix(P)
+  Y = X[:,:-1]*X[:,:-1] - X[:,1:]
+  Z = 1.0 - X[:,:-1]
+  return (100.0*Y*Y + Z*Z).sum(1)
+
+# Ackley function
+def ackleyPop(P):
+  X = popmatrix(P)
+  D = X.shape[1]
+  a = 20
+  b = 0.2
+  c = 2*math.pi
+  p = (X*X).sum(1)
+  q = np.cos(c*X).sum(1)
+  return a + math.exp(1) - a*np.exp(-b*np.sqrt(p/D)) - np.exp(q/D)
+
+# Population version of each test function
+POPVERSION = {sphere:spherePop, rastrigin:rastriginPop, schwefel:schwefelPop, griewank:griewankPop, 
+  rosenbrock_saddle:rosenbrock_saddlePop, ackley:ackleyPop}
+
+# Separable test functions: f(x) = sum_i c + t(x_i). The pair (t, c) of each separable test function
+SEPARABLE = {sphere:(sphere_1, 0.0), rastrigin:(rastrigin_1, 10.0), schwefel:(schwefel_1, 418.9829101)}
+
+##################### INCREMENTAL EVALUATION ####################
+# Incremental descriptor (key 'incremental' of a problem) of a test function f: f(x) = value(S, D) where S is a list 
+# of sums (sufficient statistics) S[j] = sum_i term(x_i)[j]. A triplet (term, value, fromvalue) where fromvalue(fx) 
+# gives S from the f value, if possible (separable functions), or it is None (S is cached per candidate solution)
+def separable(f):
+  t, c = SEPARABLE[f]
+  return (lambda v: (c + t(v),), lambda S, D: S[0], lambda fx: [fx])
+
+def ackleyterm(v): return (v*v, math.cos(2*math.pi*v))
+
+def ackleyvalue(S, D):
+  e = math.exp(1)
+  a = 20
+  b = 0.2
+  return a + e - a*math.exp(-b*(S[0]/D)**0.5) - math.exp(S[1]/D)
+
+INCREMENTAL = {sphere:separable(sphere), rastrigin:separable(rastrigin), schwefel:separable(schwefel), 
+  ackley:(ackleyterm, ackleyvalue, None)}
+
+# Determines if the problem provides incremental evaluation
+def isincremental(problem): return 'incremental' in problem
+
+# Sufficient statistics of candidate solution x
+def stats(x, term):
+  S = None
+  for v in x:
+    T = term(v)
+    if(S==None): S = list(T)
+    else:
+      for j in range(len(T)): S[j] += T[j]
+  return S
+
+# Sufficient statistics of candidate solution x, using the statistics cache of the problem (key 'stats', the last 
+# STATSCACHE candidate solutions evaluated, by identity)
+STATSCACHE = 1024
+def cachedstats(x, sgoal):
+  cache = sgoal['stats']
+  e = cache.get(id(x))
+  if(e!=None and e[0] is x): 
+    cache.move_to_end(id(x))
+    return e[1]
+  S = stats(x, sgoal['incremental'][0])
+  putstats(x, S, sgoal)
+  return S
+
+def putstats(x, S, sgoal):
+  cache = sgoal['stats']
+  cache[id(x)] = (x, S)
+  cache.move_to_end(id(x))
+  if(len(cache) > STATSCACHE): cache.popitem(last=False)
+
+# Incremental evaluation: f value of y, a candidate solution obtained by changing the coordinates in the indices 
+# array k of x. Updates the sufficient statistics of x with the terms of the changed coordinates, in O(|k|). 
+# Performs a full evaluation if most of the coordinates changed or a refresh is required (see sgoal.core.refresh). 
+# Records the evaluation as a regular function evaluation (see sgoal.core.rec)
+def realdelta(y, k, x, fx, sgoal):
+  term, value, fromvalue = sgoal['incremental']
+  if(2*len(k) > len(x) or refresh(sgoal)):
+    fy = sgoal['objective'](y)
+    if(fromvalue==None): putstats(y, stats(y, term), sgoal)
+  else:
+    S = fromvalue(fx) if fromvalue!=None else cachedstats(x, sgoal).copy()
+    for i in set(k):
+      a, b = term(x[i]), term(y[i])
+      for j in range(len(S)): S[j] += b[j] - a[j]
+    fy = value(S, len(y))
+    if(fromvalue==None): putstats(y, S, sgoal)
+  rec(y, fy, sgoal)
+  return fy
+
+# Gaussian mutation -> variation form (incremental evaluation)
+def dgaussianmutation(x, fx, sigma, feasible, sgoal):
+  y, k = hypergaussianchanges(x, sigma, feasible, 1.0/len(x))
+  fy = realdelta(y, k, x, fx, sgoal)
+  return y, fy
+
+# Crossover with (gaussian) mutation -> variation form (incremental evaluation). Same as sgoal.core.xovermutation
+# (followed by evaluating both children) but each child is evaluated from the parent it shares the first genes with
+def dxovermutation(x1, fx1, x2, fx2, sgoal):
+  sigma, feasible = sgoal['sigma'], sgoal['feasible']
+  n = len(x1)
+  if( randbool(sgoal['xr']) ): 
+    y1, y2 = simplexover(x1, x2)
+    k = [i for i in range(n) if y1[i]!=x1[i]]
+  else: y1, y2, k = x1, x2, []
+  c1, c2 = (y1, x1, fx1), (y2, x2, fx2)
+  if(randbool()): c1, c2 = c2, c1
+  z1, k1 = hypergaussianchanges(c1[0], sigma, feasible, 1.0/n)
+  z2, k2 = hypergaussianchanges(c2[0], sigma, feasible, 1.0/n)
+  c1, c2 = (z1, k+k1) + c1[1:], (z2, k+k2) + c2[1:]
+  if(randbool()): c1, c2 = c2, c1
+  fz1 = realdelta(c1[0], c1[1], c1[2], c1[3], sgoal)
+  fz2 = realdelta(c2[0], c2[1], c2[2], c2[3], sgoal)
+  return c1[0], fz1, c2[0], fz2
+
+# Sets the incremental crossover with mutation as the GA 'nextpair' variation if the problem provides incremental 
+# evaluation (and uses the default crossover and mutation)
+def dxover(problem):
+  if(isincremental(problem) and 'nextpair' not in problem and 'xover' not in problem and 'mutation' not in problem):
+    if( 'xr' not in problem ):  problem['xr'] = 0.7
+    problem['nextpair'] = lambda x1, fx1, x2, fx2, sgoal: dxovermutation(x1, fx1, x2, fx2, sgoal)
+  return problem
+
+# Sets the incremental evaluation of a separable (or ackley) test function f. Performs a full evaluation every 
+# 'refresh' evaluations
+def setincremental(problem, f, refresh=1000):
+  problem['incremental'] = INCREMENTAL[f]
+  problem['stats'] = OrderedDict()
+  problem['refresh'] = refresh
+  return problem
+
 ##################### TEST PROBLEMS ####################
-def TestProblem(f, D, EVALS, TRACE=False):
-  if(f=='Rastrigin'): problem = PROBLEM('min', rastrigin, HyperCube(-5.12, 5.12, D), EVALS, TRACE)
-  elif(f=='Schwefel'): problem = PROBLEM('min', schwefel, HyperCube(-500.0, 500.0, D), EVALS, TRACE)
-  elif(f=='Griewank'): problem = PROBLEM('min', griewank, HyperCube(-600.0, 600.0, D), EVALS, TRACE)
-  elif(f=='Rosenbrock'): problem = PROBLEM('min', rosenbrock_saddle, HyperCube(-2.048, 2.048, D), EVALS, TRACE)
-  elif(f=='Ackley'): problem = PROBLEM('min', ackley, HyperCube(-32.768, 32.768, D), EVALS, TRACE)
-  elif(f=='Sphere'): problem = PROBLEM('min', sphere, HyperCube(-5.12, 5.12, D), EVALS, TRACE)
-  else: problem = PROBLEM('min', sphere, HyperCube(-5.12, 5.12, D), EVALS, TRACE)
+# BATCH: Provides the population version of the test function as vectorized objective function if set to True
+# DELTA: Provides incremental evaluation (see setincremental) for Sphere, Rastrigin, Schwefel and Ackley
+def TestProblem(f, D, EVALS, TRACE=False, BATCH=False, DELTA=False):
+  if(f=='Rastrigin'): f, space = rastrigin, HyperCube(-5.12, 5.12, D)
+  elif(f=='Schwefel'): f, space = schwefel, HyperCube(-500.0, 500.0, D)
+  elif(f=='Griewank'): f, space = griewank, HyperCube(-600.0, 600.0, D)
+  elif(f=='Rosenbrock'): f, space = rosenbrock_saddle, HyperCube(-2.048, 2.048, D)
+  elif(f=='Ackley'): f, space = ackley, HyperCube(-32.768, 32.768, D)
+  elif(f=='Sphere'): f, space = sphere, HyperCube(-5.12, 5.12, D)
+  else: f, space = sphere, HyperCube(-5.12, 5.12, D)
+  problem = PROBLEM('min', f, space, EVALS, TRACE, POPVERSION[f] if BATCH else None)
   problem['optimum'] = 0.0
+  if(DELTA and f in INCREMENTAL): setincremental(problem, f)
   return problem
\ No newline at end of file
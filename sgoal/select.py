@@ -18,6 +18,9 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 import random as rand
+import numpy as np
+from sgoal.util import uniforms
+from sgoal.util import randints
 
 ############### UTILITY FUNCTIONS ################
 # A permutation of n elements
@@ -133,4 +136,85 @@ def min_roulette(quality, N):
 # Maximization version
 def max_roulette(quality, N):
   p = max_adjustquality(quality)
-  return [weighted(p) for i in range(N)]
\ No newline at end of file
+  return [weighted(p) for i in range(N)]
+
+############### VECTORIZED SELECTION MECHANISMS ################
+# Select the N individuals in a single (numpy) call. Random numbers are drawn from Python's generator (see uniforms 
+# and randints in sgoal.util), so runs are reproducible with random.seed. Each mechanism returns a list of indices 
+# (ints), as the ones above.
+
+# Index of the element (of each row) selected by a roulette on weights w (a vector or a matrix with a weight vector
+# per row) using the cumulative sum of the weights and a binary search of uniform numbers (bisect)
+# w: Weights (non negative values, they do not need to be normalized)
+# N: Number of selections (for a vector of weights)
+def cumweighted(w, N=1):
+  c = np.cumsum(w, axis=-1)
+  if(c.ndim == 1): k = np.searchsorted(c, c[-1]*uniforms(N), side='right')
+  else: k = (c <= c[:,-1:]*uniforms((len(c),1))).sum(axis=1)
+  return np.minimum(k, c.shape[-1]-1)
+
+#### Weighted selection of one element per row: rates[i] are the probabilities of selecting each element for row i ####
+def weightedrows(rates): return cumweighted(np.asarray(rates, dtype=np.float64)).tolist()
+
+# Adjust function values (quality arrays) to real quality measures (q_i > 0). Vectorized version of adjustquality
+def vadjustquality(quality):
+  q = np.asarray(quality, dtype=np.float64)
+  m = q.min()
+  above = q[q > m]
+  if(len(above)==0): return np.ones(len(q))
+  return q - m + (above.min() - m)
+
+#### Roulette wheel selection. Selects N individuals. ####
+# Minimization version
+def min_vroulette(quality, N):
+  return cumweighted(vadjustquality(-np.asarray(quality, dtype=np.float64)), N).tolist()
+
+# Maximization version
+def max_vroulette(quality, N):
+  return cumweighted(vadjustquality(quality), N).tolist()
+
+#### Batched tournament selection. Picks m individuals at random (per selection) and returns the best one ####
+# Selects N individuals (ties are broken in favor of the last candidate, as in tournament1)
+# minimize: If the best individual is the one with the lowest quality value
+def tournamentN(quality, N, m=4, minimize=True):
+  q = np.asarray(quality)
+  candidate = randints(len(q), (N,m))
+  c = q[candidate][:,::-1]
+  x = m - 1 - (c.argmin(axis=1) if minimize else c.argmax(axis=1))
+  return candidate[np.arange(N), x].tolist()
+
+# Tournament selection of size m. Minimization version
+def min_vtournament(m=4): return lambda quality, N: tournamentN(quality, N, m, True)
+
+# Tournament selection of size m. Maximization version
+def max_vtournament(m=4): return lambda quality, N: tournamentN(quality, N, m, False)
+
+# Indices of the quality array sorted from the best to the worst quality value
+def ranking(quality, minimize=True):
+  q = np.asarray(quality)
+  return np.argsort(q if minimize else -q, kind='stable')
+
+#### Linear rank selection. The probability of selecting an individual is proportional to its rank 
+# (n for the best one, 1 for the worst one) ####
+def rankN(quality, N, minimize=True):
+  order = ranking(quality, minimize)
+  n = len(order)
+  return order[cumweighted(np.arange(n, 0, -1, dtype=np.float64), N)].tolist()
+
+# Minimization version
+def min_rank(quality, N): return rankN(quality, N, True)
+
+# Maximization version
+def max_rank(quality, N): return rankN(quality, N, False)
+
+#### Truncation selection. Picks (uniformly) among the best t fraction of the individuals ####
+def truncationN(quality, N, t=0.5, minimize=True):
+  order = ranking(quality, minimize)
+  n = max(1, int(np.ceil(t*len(order))))
+  return order[randints(n, N)].tolist()
+
+# Minimization version
+def min_truncation(t=0.5): return lambda quality, N: truncationN(quality, N, t, True)
+
+# Maximization version
+def max_truncation(t=0.5): return lambda quality, N: truncationN(quality, N, t, False)
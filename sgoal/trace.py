@@ -0,0 +1,155 @@
+# Streaming (on disk) trace sinks.
+# Copyright (c)
+# Authors: Jonatan Gomez and Elizabeth León
+# E-mails: jgomezpe@unal.edu.co  and eleonguz@unal.edu.co
+# All rights reserved.
+# Licence
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the following conditions are met:
+# Redistributions of source code must retain the above copyright notice, this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the distribution.
+# Neither the name of the copyright owners, their employers, nor the names of its contributors may be used to endorse or
+# promote products derived from sgoal.this software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT OWNERS OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import glob
+import math
+import numpy as np
+
+############### DOWNSAMPLING ################
+# Keeps every k-th value (by position in the traced sequence)
+def every(k=1):
+  return lambda i: i % k == 0
+
+# Keeps (approximately) points values per decade of positions (log-spaced checkpoints): 0, 1, 2, ..., 10, 12, 15, ...
+def logspaced(points=10):
+  return lambda i: i<=points or math.floor(points*math.log10(i+1)) != math.floor(points*math.log10(i))
+
+############### TRACE COLUMN ################
+# A traced sequence of values (numbers or vectors) stored on disk as chunked float64 .npz files (name-00000.npz, ...).
+# Each chunk file keeps the arrays
+#   'index': Position (in the traced sequence) of each kept value
+#   'values': The kept values (flattened)
+#   'lengths': Number of floats of each kept value
+# Works as an appendable list (append/extend) so it can replace the in memory lists of a trace.
+# path: Path prefix of the chunk files
+# keep: Downsampling predicate on the position of a value (see every and logspaced). Keeps all the values if None
+# chunk: Number of floats buffered in memory before writing a chunk file
+class TraceColumn(object):
+  def __init__(self, path, keep=None, chunk=65536):
+    self.path = path
+    self.keep = keep
+    self.chunk = chunk
+    self.count = 0
+    self.files = 0
+    self.last = None
+    self.clear()
+
+  # Clears the in memory buffer
+  def clear(self):
+    self.index = []
+    self.values = []
+    self.lengths = []
+    self.size = 0
+
+  # Appends a value (number or vector) to the column
+  def append(self, v):
+    i = self.count
+    self.count += 1
+    if(self.keep!=None and not self.keep(i)):
+      self.last = (i, v)
+      return
+    self.last = None
+    v = np.asarray(v, dtype=np.float64).ravel()
+    self.index.append(i)
+    self.values.append(v)
+    self.lengths.append(len(v))
+    self.size += len(v)
+    if(self.size >= self.chunk): self.write()
+
+  # Appends a sequence of values to the column
+  def extend(self, V):
+    for v in V: self.append(v)
+
+  # Writes the in memory buffer as a chunk file
+  def write(self):
+    if(len(self.index)==0): return
+    np.savez(self.path + '-%05d.npz' % self.files, index=np.array(self.index, dtype=np.int64),
+             values=np.concatenate(self.values), lengths=np.array(self.lengths, dtype=np.int64))
+    self.files += 1
+    self.clear()
+
+  # Writes the buffered values (including the last appended value even if it was not kept by the downsampling)
+  def flush(self):
+    if(self.last!=None):
+      i, v = self.last
+      self.last = None
+      v = np.asarray(v, dtype=np.float64).ravel()
+      self.index.append(i)
+      self.values.append(v)
+      self.lengths.append(len(v))
+    self.write()
+
+  # Number of values appended to the column (kept or not)
+  def __len__(self): return self.count
+
+# Chunk files of a trace column (sorted)
+def chunkfiles(path):
+  return sorted(glob.glob(glob.escape(path) + '-[0-9][0-9][0-9][0-9][0-9].npz'))
+
+# Removes the chunk files of a trace column (left by a previous run in the same directory)
+def removecolumn(path):
+  for name in chunkfiles(path): os.remove(name)
+
+# Loads a trace column from its chunk files. Returns the positions of the kept values and the values
+# (a vector if each value is a number, a list of vectors otherwise)
+def loadcolumn(path):
+  index = []
+  values = []
+  lengths = []
+  for name in chunkfiles(path):
+    with np.load(name) as data:
+      index.append(data['index'])
+      values.append(data['values'])
+      lengths.append(data['lengths'])
+  if(len(index)==0): return np.zeros(0, dtype=np.int64), np.zeros(0)
+  index, values, lengths = np.concatenate(index), np.concatenate(values), np.concatenate(lengths)
+  if(np.all(lengths==1)): return index, values
+  return index, np.split(values, np.cumsum(lengths)[:-1])
+
+############### TRACE SINK ################
+# A trace (see PROBLEM in sgoal.core) that streams the traced information to a directory
+#   'f', 'best': Evolution of the objective function values (calls) and the best value, downsampled with evals
+#   'fP', 'rates': Evolution of the population objective function values and CHAVELA's average operator rates,
+#       downsampled with generations
+#   'flush': Writes the buffered information (called by sgoal.core.run at the end of a run)
+# dir: Directory where chunk files are stored (created if required). Chunk files of a previous trace are removed
+# evals: Downsampling predicate for the 'f' and 'best' values (for instance logspaced()). Keeps all if None
+# generations: Downsampling predicate for the 'fP' and 'rates' values (for instance every(10)). Keeps all if None
+# chunk: Number of floats buffered in memory (per column) before writing a chunk file
+def TRACESINK(dir, evals=None, generations=None, chunk=65536):
+  os.makedirs(dir, exist_ok=True)
+  trace = {}
+  for name, keep in [('f', evals), ('best', evals), ('fP', generations), ('rates', generations)]:
+    removecolumn(os.path.join(dir, name))
+    trace[name] = TraceColumn(os.path.join(dir, name), keep, chunk)
+  trace['flush'] = lambda : flushtrace(trace)
+  return trace
+
+# Writes the buffered information of each column of a trace sink
+def flushtrace(trace):
+  for v in trace.values():
+    if(isinstance(v, TraceColumn)): v.flush()
+
+# Loads a trace stored in a directory. A dictionary with the traced columns, each one a pair (positions, values)
+def loadtrace(dir):
+  trace = {}
+  for name in ['f', 'best', 'fP', 'rates']:
+    trace[name] = loadcolumn(os.path.join(dir, name))
+  return trace
@@ -17,17 +17,55 @@
 # HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) 
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import math
 import random as rand
+import numpy as np
 from inspect import signature
+from inspect import Parameter
 
 ############### UTILITY FUNCTIONS ################
-# Arity of a variation operator f. Used for computing number of required parents
-def arity(f): return len(signature(f).parameters)
+# Arity of a variation operator f. Used for computing number of required parents. Parameters with a default value 
+# are not counted, so a functools.partial fixing the extra arguments by keyword has the arity of the variation
+def arity(f): 
+  return len([p for p in signature(f).parameters.values() 
+              if p.default is Parameter.empty and p.kind in (Parameter.POSITIONAL_ONLY, Parameter.POSITIONAL_OR_KEYWORD)])
+
+# Seeds the random number generators (Python's and numpy's global one, used by vectorized operations)
+def seed(s):
+  rand.seed(s)
+  np.random.seed(s % 2**32)
+
+# Deterministic seed for the k-th run of an experiment (using the given base seed)
+def runseed(seed, k): return seed*1000003 + k
+
+# Array (of the given shape) of uniform random numbers in [0,1) drawn from Python's generator (so vectorized operations 
+# are reproducible with random.seed, as the rest of the package)
+def uniforms(shape):
+  n = int(np.prod(shape))
+  return np.fromiter((rand.random() for i in range(n)), dtype=np.float64, count=n).reshape(shape)
+
+# Array (of the given shape) of random integers in range(n) drawn from Python's generator
+def randints(n, shape):
+  m = int(np.prod(shape))
+  return np.fromiter((rand.randrange(n) for i in range(m)), dtype=np.int64, count=m).reshape(shape)
 
 # Generates a boolean value according to probability p ( True with probability p, False otherwise )
 def randbool(p=0.5):
   return (rand.random() < p)
 
+# Indices (in increasing order) of a random subset of range(n), each index is chosen with probability p.
+# Uses geometric gap sampling, so it draws as many random numbers as chosen indices (plus one) instead of n
+def randindices(n, p):
+  if(p<=0): return []
+  if(p>=1): return [i for i in range(n)]
+  lq = math.log1p(-p)
+  k = []
+  i = int(math.log(1.0-rand.random())/lq)
+  while(i<n):
+    k.append(i)
+    i += 1 + int(math.log(1.0-rand.random())/lq)
+  return k
+
 # A permutation of n elements
 def permutation(n):
   x = [i for i in range(0,n)]
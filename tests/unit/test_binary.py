@@ -0,0 +1,87 @@
+import random
+import unittest
+
+import numpy as np
+
+from sgoal import core
+from sgoal import binary
+
+FUNCTIONS = ['MaxOnes', 'GD3', 'GD4', 'RR1', 'RR2', 'Mixed', 'Mixed2']
+D = 240
+
+
+def genomes(n, seed=1):
+    random.seed(seed)
+    return [[random.randint(0, 1) for i in range(D)] for j in range(n)]
+
+
+class TestPacked(unittest.TestCase):
+
+    def test_pack_unpack(self):
+        for x in genomes(5) + [[0]*D, [1]*D]:
+            self.assertEqual(binary.unpack(binary.pack(x), D), x)
+
+    def test_operations_match_unpacked(self):
+        for x in genomes(5):
+            p = binary.pack(x)
+            self.assertEqual(binary.unpack(binary.pflip(p, 7), D), binary.flip(x, 7))
+            self.assertEqual(binary.unpack(binary.pmultiflip(p, [0, 5, D-1], D), D), binary.multiflip(x, [0, 5, D-1]))
+            self.assertEqual(binary.unpack(binary.pcomplement(p, D), D), binary.complement(x))
+
+    def test_objective_matches_unpacked(self):
+        for name in FUNCTIONS:
+            f = binary.TestProblem(name, D, 10)['objective']
+            pf = binary.TestProblem(name, D, 10, PACKED=True)['objective']
+            for x in genomes(5):
+                self.assertEqual(pf(binary.pack(x)), f(x))
+
+
+class TestPopVersions(unittest.TestCase):
+
+    def test_population_versions_match(self):
+        P = genomes(20)
+        for name in FUNCTIONS:
+            f = binary.TestProblem(name, D, 10)['objective']
+            fP = [f(x) for x in P]
+            self.assertEqual(binary.TestProblem(name, D, 10, BATCH=True)['fbatch'](P).tolist(), fP)
+            self.assertEqual(binary.TestProblem(name, D, 10, BATCH=True)['fbatch'](np.array(P, dtype=bool)).tolist(), fP)
+            packed = binary.TestProblem(name, D, 10, PACKED=True, BATCH=True)
+            self.assertEqual(packed['fbatch']([binary.pack(x) for x in P]).tolist(), fP)
+
+
+def run(algorithm, name, DELTA, seed=9):
+    random.seed(seed)
+    sgoal = algorithm(binary.TestProblem(name, D, 2000, DELTA=DELTA))
+    core.run(sgoal)
+    return sgoal
+
+
+class TestDelta(unittest.TestCase):
+
+    def test_delta_flips_match_full_evaluation(self):
+        for name in FUNCTIONS:
+            problem = core.SPSGoal(binary.TestProblem(name, D, 1000, DELTA=True))
+            f = problem['objective']
+            for x in genomes(5):
+                fx = f(x)
+                for k in [[3], [0, 1, 2, D-1], list(range(0, D, 7)), []]:
+                    y, fy = problem['multiflip'](x, fx, k)
+                    self.assertEqual(fy, f(y))
+                    z = list(x)
+                    self.assertEqual(problem['imultiflip'](z, fx, k), f(z))
+                    self.assertEqual(z, y)
+                y, fy = problem['flip'](x, fx, 11)
+                self.assertEqual(fy, f(y))
+
+    def test_delta_runs_match_full_runs(self):
+        for algorithm in [binary.HC, binary.RMHC]:
+            for name in ['MaxOnes', 'GD3', 'RR1', 'Mixed']:
+                a, b = run(algorithm, name, False), run(algorithm, name, True)
+                self.assertEqual(a['best']['f'], b['best']['f'])
+                self.assertEqual(a['best']['evals'], b['best']['evals'])
+                self.assertEqual(a['count'], b['count'])
+                self.assertEqual(a['best']['x'], b['best']['x'])
+
+
+if __name__ == '__main__':
+    unittest.main()
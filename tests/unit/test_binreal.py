@@ -0,0 +1,60 @@
+import random
+import unittest
+
+import numpy as np
+
+from sgoal import core
+from sgoal import binreal
+
+SIZE = 16
+
+
+def genomes(n, D, seed=1):
+    random.seed(seed)
+    return [[random.randint(0, 1) for i in range(D*SIZE)] for j in range(n)]
+
+
+class TestDecoding(unittest.TestCase):
+
+    def test_decode_matches_grow(self):
+        space = binreal.HyperCube2Binary(-5.12, 5.12, 4, SIZE)
+        min, length = [-5.12]*4, [10.24]*4
+        for x in genomes(10, 4):
+            self.assertEqual(space['grow'](x), binreal.grow(x, min, length, SIZE))
+
+    def test_decode_gray_matches_grow1gray(self):
+        space = binreal.HyperCube2Binary(-5.12, 5.12, 4, SIZE, GRAY=True)
+        for x in genomes(10, 4):
+            self.assertEqual(space['grow'](x), [binreal.grow1gray(x, -5.12, 10.24, SIZE, i) for i in range(4)])
+
+    def test_decode_population_matches_rows(self):
+        for GRAY in [False, True]:
+            decoder = binreal.HyperCube2Binary(-5.12, 5.12, 4, SIZE, GRAY)['decoder']
+            P = genomes(10, 4)
+            self.assertEqual(binreal.decode(np.array(P), decoder).tolist(), [binreal.decode(x, decoder) for x in P])
+
+    def test_batch_objective_matches(self):
+        for name in ['Sphere', 'Rastrigin', 'Ackley']:
+            problem = binreal.Real2BinaryTestProblem(name, 4, 10, SIZE, BATCH=True)
+            P = genomes(10, 4)
+            np.testing.assert_allclose(problem['fbatch'](P), [problem['objective'](x) for x in P], rtol=1e-10)
+
+
+class TestDelta(unittest.TestCase):
+
+    def test_delta_flips_match_full_evaluation(self):
+        for GRAY in [False, True]:
+            for name in ['Sphere', 'Rastrigin', 'Schwefel']:
+                problem = core.SPSGoal(binreal.Real2BinaryTestProblem(name, 6, 10000, SIZE, GRAY=GRAY, DELTA=True))
+                f = problem['objective']
+                x = genomes(1, 6)[0]
+                fx = f(x)
+                for i in range(200):
+                    x, fx = problem['flip'](x, fx, random.randrange(len(x)))
+                    self.assertAlmostEqual(fx, f(x), delta=1e-7*max(1.0, abs(fx)))
+                y, fy = problem['multiflip'](x, fx, [0, 1, SIZE, 3*SIZE+2])
+                self.assertAlmostEqual(fy, f(y), delta=1e-7*max(1.0, abs(fy)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import random
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from sgoal import core
+from sgoal import binary
+from sgoal import chavela
+from sgoal import util
+
+
+def run(BATCH=False, seed=13, npseed=None, **keys):
+    util.seed(seed)
+    if(npseed is not None): np.random.seed(npseed)
+    problem = binary.TestProblem('RR1', 64, 3000, BATCH=BATCH)
+    problem.update(keys)
+    sgoal = binary.CHAVELA(problem)
+    core.run(sgoal)
+    return sgoal
+
+
+class TestCHAVELA(unittest.TestCase):
+
+    def assertSameRun(self, a, b):
+        self.assertEqual(a['best']['f'], b['best']['f'])
+        self.assertEqual(a['best']['evals'], b['best']['evals'])
+        self.assertEqual(a['count'], b['count'])
+        self.assertEqual(list(a['best']['x']), list(b['best']['x']))
+
+    def test_reproducible_with_random_seed(self):
+        # numpy's generator must not drive operator choice nor rates updates
+        a = run(npseed=1)
+        b = run(npseed=2)
+        self.assertSameRun(a, b)
+        np.testing.assert_array_equal(a['rates'], b['rates'])
+
+    def test_batch_matches_sequential(self):
+        self.assertSameRun(run(), run(BATCH=True))
+
+    def test_parallel_matches_itself(self):
+        self.assertSameRun(run(parallel=True, npseed=3), run(parallel=True, npseed=4))
+
+    def test_process_pool_matches_current_process(self):
+        with ProcessPoolExecutor(2) as executor:
+            self.assertSameRun(run(parallel=True), run(parallel=True, executor=executor))
+
+    def test_thread_pool_is_rejected(self):
+        with ThreadPoolExecutor(2) as executor:
+            with self.assertRaises(ValueError):
+                run(parallel=True, executor=executor)
+
+    def test_update_rates_pop(self):
+        random.seed(7)
+        rates = chavela.initRatesPop(3, 2)
+        chavela.updateRatesPop([True, False], [0, 1], rates)
+        np.testing.assert_allclose(rates.sum(axis=1), 1.0)
+        self.assertGreater(rates[0, 0], 0.5)
+        self.assertGreater(rates[1, 0], 0.5)
+        np.testing.assert_array_equal(rates[2], [0.5, 0.5])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+import random
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from sgoal import core
+from sgoal import binary
+from sgoal import real
+
+
+def maxones_problem(EVALS=2000):
+    problem = binary.TestProblem('MaxOnes', 20, EVALS)
+    problem['optimum'] = None
+    return problem
+
+
+class TestEngine(unittest.TestCase):
+
+    def test_problem_is_a_dict(self):
+        problem = maxones_problem()
+        self.assertIs(type(problem), dict)
+
+    def test_inlined_vr_loop_matches_next(self):
+        random.seed(7)
+        sgoal = binary.RMHC(maxones_problem())
+        best = core.run(sgoal)
+
+        random.seed(7)
+        other = binary.RMHC(maxones_problem())
+        x, fx = other['init']()
+        while(not other['stop']()):
+            x, fx = other['next'](x, fx)
+        self.assertEqual(best['f'], other['best']['f'])
+        self.assertEqual(best['x'], other['best']['x'])
+        self.assertEqual(sgoal['count'], other['count'])
+
+    def test_rule1_5_variation_changes_while_running(self):
+        random.seed(3)
+        sgoal = real.Rule1_5(real.TestProblem('Sphere', 5, 500))
+        core.run(sgoal)
+        self.assertEqual(sgoal['count'], 500)
+
+    def test_rec_propagates_pick_errors(self):
+        sgoal = core.SPSGoal(maxones_problem())
+        sgoal['f']([0]*20)
+
+        def pick(x, fx, y, fy): raise AttributeError('pick')
+        sgoal['pick'] = pick
+        with self.assertRaises(AttributeError):
+            sgoal['f']([1]*20)
+
+
+def sumproblem(type, fbatch=None, TRACE=True):
+    return core.SPSGoal(core.PROBLEM(type, sum, core.SPACE(lambda: [random.randint(0, 3) for i in range(4)]),
+                                     100, TRACE, fbatch))
+
+
+class TestBatchEvaluation(unittest.TestCase):
+
+    P = [[1, 0, 0, 0], [3, 3, 0, 0], [0, 0, 0, 0], [2, 2, 2, 0], [1, 1, 1, 3], [0, 0, 0, 0], [3, 3, 0, 0]]
+
+    def assertSameRecords(self, a, b):
+        self.assertEqual(a['count'], b['count'])
+        self.assertEqual(a['best'], b['best'])
+        self.assertEqual(a['trace']['f'], b['trace']['f'])
+        self.assertEqual(a['trace']['best'], b['trace']['best'])
+
+    def test_recpop_matches_rec(self):
+        for type in ['min', 'max']:
+            a, b = sumproblem(type), sumproblem(type)
+            for P in [self.P[:3], self.P[3:]]:
+                fP = [sum(x) for x in P]
+                for x, fx in zip(P, fP): core.rec(x, fx, a)
+                core.recPop(P, fP, b)
+                self.assertSameRecords(a, b)
+                self.assertIs(b['best']['x'], a['best']['x'])
+
+    def test_fpop_batch_matches_sequential(self):
+        for type in ['min', 'max']:
+            a = sumproblem(type)
+            b = sumproblem(type, fbatch=lambda P: [sum(x) for x in P])
+            self.assertTrue(core.batchmode(b))
+            self.assertEqual(a['fpop'](self.P), b['fpop'](self.P))
+            self.assertSameRecords(a, b)
+
+    def test_fpop_executor_matches_sequential(self):
+        a = sumproblem('max')
+        b = sumproblem('max')
+        with ThreadPoolExecutor(2) as executor:
+            b['executor'] = executor
+            self.assertEqual(a['fpop'](self.P), b['fpop'](self.P))
+        self.assertSameRecords(a, b)
+
+
+class TestCache(unittest.TestCase):
+
+    def run_rmhc(self, cache, seed=5):
+        random.seed(seed)
+        problem = maxones_problem(3000)
+        problem['cache'] = cache
+        sgoal = binary.RMHC(problem)
+        core.run(sgoal)
+        return sgoal
+
+    def test_counted_hits_match_no_cache(self):
+        a = self.run_rmhc(None)
+        b = self.run_rmhc(core.CACHE())
+        self.assertEqual(a['best'], b['best'])
+        self.assertEqual(a['count'], b['count'])
+        self.assertGreater(b['cache']['hits'], 0)
+        self.assertEqual(b['cache']['hits'] + b['cache']['misses'], b['count'])
+
+    def test_cache_is_bounded(self):
+        sgoal = self.run_rmhc(core.CACHE(size=16))
+        self.assertLessEqual(len(sgoal['cache']['table']), 16)
+
+    def test_uncounted_hits_are_not_recorded(self):
+        sgoal = core.SPSGoal(maxones_problem())
+        sgoal['cache'] = core.CACHE(counthits=False)
+        for i in range(3): sgoal['f']([1]*20)
+        self.assertEqual(sgoal['count'], 1)
+        self.assertEqual(sgoal['cache']['hits'], 2)
+
+
+def onemax(k): return maxones_problem(500)
+
+
+class TestExperiment(unittest.TestCase):
+
+    def test_runs_do_not_depend_on_the_workers(self):
+        a = core.pexperiment(binary.RMHC, onemax, R=6, seed=3, workers=1)
+        b = core.pexperiment(binary.RMHC, onemax, R=6, seed=3, workers=1)
+        c = core.pexperiment(binary.RMHC, onemax, R=6, seed=3, workers=2)
+        self.assertEqual(a[:3], b[:3])
+        self.assertEqual(a[:3], c[:3])
+        self.assertEqual(len(a[3]), 6)
+
+    def test_runs_depend_on_the_seed(self):
+        a = core.pexperiment(binary.RMHC, onemax, R=6, seed=3, workers=1)
+        b = core.pexperiment(binary.RMHC, onemax, R=6, seed=4, workers=1)
+        self.assertNotEqual(a[:2], b[:2])
+
+
+if __name__ == '__main__':
+    unittest.main()
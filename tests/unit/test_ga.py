@@ -0,0 +1,57 @@
+import random
+import unittest
+
+import numpy as np
+
+from sgoal import core
+from sgoal import binary
+from sgoal import util
+
+
+def run(algorithm, BATCH=False, array=False, seed=11, PACKED=False, **keys):
+    util.seed(seed)
+    problem = binary.TestProblem('RR1', 64, 3000, PACKED=PACKED, BATCH=BATCH)
+    problem['array'] = array
+    problem.update(keys)
+    sgoal = algorithm(problem)
+    core.run(sgoal)
+    return sgoal
+
+
+class TestBatch(unittest.TestCase):
+
+    def assertSameRun(self, a, b):
+        self.assertEqual(a['best']['f'], b['best']['f'])
+        self.assertEqual(a['best']['evals'], b['best']['evals'])
+        self.assertEqual(a['count'], b['count'])
+        self.assertEqual(np.asarray(a['best']['x']).tolist(), np.asarray(b['best']['x']).tolist())
+
+    def test_batch_gga_matches_sequential(self):
+        self.assertSameRun(run(binary.GGA), run(binary.GGA, BATCH=True))
+
+    def test_batch_ssga_is_opt_in(self):
+        self.assertSameRun(run(binary.SSGA), run(binary.SSGA, BATCH=True))
+
+    def test_batchpairs_ssga_uses_the_budget(self):
+        sgoal = run(binary.SSGA, BATCH=True, batchpairs=True)
+        self.assertEqual(sgoal['count'], 3000)
+
+    def test_array_gga_matches_list(self):
+        a = run(binary.GGA)
+        b = run(binary.GGA, array=True)
+        self.assertSameRun(a, b)
+        self.assertIsInstance(b['P'], np.ndarray)
+
+    def test_packed_array_gga_matches_list(self):
+        a = run(binary.GGA, PACKED=True)
+        b = run(binary.GGA, array=True, PACKED=True)
+        self.assertSameRun(a, b)
+        self.assertEqual(b['P'].dtype, object)
+        self.assertIsInstance(b['best']['x'], int)
+
+    def test_packed_array_batch_gga_matches_list(self):
+        self.assertSameRun(run(binary.GGA, BATCH=True, PACKED=True), run(binary.GGA, BATCH=True, array=True, PACKED=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import random
+import unittest
+
+from sgoal import core
+from sgoal import binary
+from sgoal import gabo
+
+
+def run(f, D, EVALS, inplace=True, DELTA=False, seed=5, **keys):
+    random.seed(seed)
+    problem = binary.TestProblem(f, D, EVALS, DELTA=DELTA)
+    if(not inplace):
+        del problem['iflip']
+        del problem['imultiflip']
+    problem.update(keys)
+    sgoal = gabo.GABO(problem)
+    core.run(sgoal)
+    return sgoal
+
+
+class TestInPlace(unittest.TestCase):
+
+    def test_test_problem_installs_inplace_variations(self):
+        problem = binary.TestProblem('RR1', 64, 1000)
+        self.assertTrue(gabo.inplace(problem))
+        self.assertFalse('blocks' in problem)
+
+    # In place mode keeps the first best candidate solution on ties (it copies it only on strict improvements)
+    def test_inplace_matches_copy(self):
+        for f in ['MaxOnes', 'RR1', 'GD4']:
+            for DELTA in [False, True]:
+                a = run(f, 64, 3000, True, DELTA)
+                b = run(f, 64, 3000, False, DELTA)
+                self.assertEqual(a['best']['f'], b['best']['f'])
+                self.assertEqual(a['best']['evals'], b['best']['evals'])
+                self.assertEqual(a['count'], b['count'])
+
+    def test_inplace_best_is_not_mutated(self):
+        sgoal = run('RR1', 64, 3000)
+        x = sgoal['best']['x']
+        self.assertEqual(binary.royalroad8(x), sgoal['best']['f'])
+
+
+class TestBatchProbes(unittest.TestCase):
+
+    def test_batch_matches_sequential(self):
+        for f in ['MaxOnes', 'RR1', 'GD4']:
+            a = run(f, 64, 3000, inplace=False)
+            for B in [1, 7, 64]:
+                b = run(f, 64, 3000, inplace=False, batchprobes=B)
+                self.assertEqual(a['best']['f'], b['best']['f'])
+                self.assertEqual(a['best']['evals'], b['best']['evals'])
+                self.assertEqual(a['count'], b['count'])
+                self.assertEqual(list(a['best']['x']), list(b['best']['x']))
+
+    def test_batch_one_pass_accepts_every_improvement(self):
+        random.seed(1)
+        problem = binary.TestProblem('MaxOnes', 120, 10**6)
+        problem['batchprobes'] = 120
+        sgoal = gabo.GABO(problem)
+        x = [0]*60 + [1]*60
+        gabo.allelesCheck(x, 60, sgoal)
+        self.assertEqual(sgoal['best']['f'], 120)
+
+
+class TestContributions(unittest.TestCase):
+
+    def test_add_keeps_the_highest_contributions(self):
+        C = gabo.CONTRIBUTIONS(3)
+        for k, c in [(0, 2.0), (0, 5.0), (0, 1.0), (0, -3.0), (1, 0.0), (0, -4.0), (2, -1.0)]:
+            gabo.addC(C, k, c)
+        self.assertEqual((C['pos'][0], C['tpos'][0]), (5.0, 2))
+        self.assertEqual((C['neg'][0], C['tneg'][0]), (4.0, 6))
+        self.assertEqual(list(C['nonzero']), [5, 0, 1])
+        self.assertEqual(C['time'], 7)
+        self.assertTrue(gabo.intronLike(C, 1))
+
+    def test_runs_match_unbounded_contributions(self):
+        # best f, evals and count of the GABO version keeping every contribution in lists
+        for f, expected in [('RR1', (96, 4477, 5000)), ('Mixed', (242, 3773, 5000)), ('GD4', (120, 364, 364))]:
+            sgoal = run(f, 120, 5000, inplace=False)
+            self.assertEqual((sgoal['best']['f'], sgoal['best']['evals'], sgoal['count']), expected)
+
+
+class TestPacked(unittest.TestCase):
+
+    def test_gabo_rejects_packed(self):
+        with self.assertRaisesRegex(ValueError, 'GABO'):
+            gabo.GABO(binary.TestProblem('MaxOnes', 16, 100, PACKED=True))
+
+    def test_acia_rejects_packed(self):
+        with self.assertRaisesRegex(ValueError, 'ACIA'):
+            gabo.ACIA(binary.TestProblem('MaxOnes', 16, 100, PACKED=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import random
+import unittest
+
+from sgoal import core
+from sgoal import binary
+from sgoal import gsc1
+
+
+def run(algorithm, name, chunk, BATCH=False, seed=8):
+    random.seed(seed)
+    problem = binary.TestProblem(name, 60, 3000, BATCH=BATCH)
+    problem['chunk'] = chunk
+    sgoal = algorithm(problem)
+    core.run(sgoal)
+    return sgoal
+
+
+class TestGS1(unittest.TestCase):
+
+    def test_chunks_do_not_change_the_result(self):
+        for algorithm in [gsc1.GS1, gsc1.GSC1]:
+            for name in ['MaxOnes', 'GD3']:
+                a = run(algorithm, name, 4096)
+                for b in [run(algorithm, name, 7), run(algorithm, name, 100, BATCH=True)]:
+                    self.assertEqual(a['best'], b['best'])
+                    self.assertEqual(a['count'], b['count'])
+
+    def test_gs1_solves_maxones(self):
+        sgoal = run(gsc1.GS1, 'MaxOnes', 512)
+        self.assertEqual(sgoal['best']['f'], 60)
+
+
+if __name__ == '__main__':
+    unittest.main()
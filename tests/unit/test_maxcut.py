@@ -0,0 +1,117 @@
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+from sgoal import core
+from sgoal import maxcut
+
+D = 60
+
+
+def graph(seed=1):
+    random.seed(seed)
+    E = {(a, b) for a in range(1, D+1) for b in range(a+1, D+1) if random.random() < 0.15}
+    return maxcut.relations(D, [[a, b, random.choice([-1, 1])] for a, b in sorted(E)])
+
+
+def problem(EVALS=100000, BATCH=False):
+    REL, WREL, W = graph()
+    return core.SPSGoal(maxcut.MaxCutProblem(REL, WREL, W, EVALS, BATCH))
+
+
+def genomes(n, seed=2):
+    random.seed(seed)
+    return [[random.randint(0, 1) for i in range(D)] for j in range(n)]
+
+
+class TestCSR(unittest.TestCase):
+
+    def test_csr_matches_standard_function(self):
+        p = problem(BATCH=True)
+        P = genomes(10)
+        fP = [maxcut.maxcut(x, p['W']) for x in P]
+        self.assertEqual([p['objective'](x) for x in P], fP)
+        self.assertEqual(p['fbatch'](P).tolist(), fP)
+        self.assertEqual(p['fbatch'](np.array(P, dtype=bool)).tolist(), fP)
+
+    def test_delta_matches_full_evaluation(self):
+        p = problem()
+        for x in genomes(10):
+            fx = maxcut.maxcut(x, p['W'])
+            for k in [[4], [0, 1, 2, 30], random.sample(range(D), maxcut.CSRDELTA), random.sample(range(D), D-1)]:
+                y, fy = maxcut.mflip(x, fx, k, p)
+                self.assertEqual(fy, maxcut.maxcut(y, p['W']))
+                y, fy = maxcut.mflip(np.array(x), fx, k, p)
+                self.assertEqual(fy, maxcut.maxcut(y, p['W']))
+                z = list(x)
+                self.assertEqual(maxcut.imflip(z, fx, k, p), maxcut.maxcut(z, p['W']))
+
+
+class TestLoad(unittest.TestCase):
+
+    EDGES = [[1, 2, 1], [1, 3, -1], [2, 4, 1], [3, 4, 1], [4, 5, -1]]
+
+    def write(self, dir):
+        path = os.path.join(dir, 'g.txt')
+        with open(path, 'w') as file:
+            file.write('5 5\n' + ''.join('%d %d %d\n' % tuple(e) for e in self.EDGES))
+        return path
+
+    def test_readfile_matches_relations(self):
+        with tempfile.TemporaryDirectory() as dir:
+            path = self.write(dir)
+            expected = maxcut.relations(5, self.EDGES)
+            self.assertEqual(maxcut.readfile(path), expected)
+            self.assertTrue(os.path.exists(path + '.npy'))
+            self.assertEqual(maxcut.readfile(path), expected)
+
+    def test_stale_cache_is_rebuilt(self):
+        with tempfile.TemporaryDirectory() as dir:
+            path = self.write(dir)
+            maxcut.readfile(path)
+            self.EDGES = self.EDGES[:3]
+            self.write(dir)
+            os.utime(path, (os.path.getmtime(path + '.npy') + 10,)*2)
+            D, E = maxcut.load(path)
+            self.assertEqual((D, E.tolist()), (5, self.EDGES))
+
+
+class TestGainTable(unittest.TestCase):
+
+    def assertGains(self, T, p):
+        x = T['x']
+        fx = maxcut.maxcut(x, p['W'])
+        self.assertEqual(T['gain'], [maxcut.maxcut(maxcut.flip(x, v), p['W']) - fx for v in range(D)])
+
+    def test_gains_follow_flips(self):
+        p = problem()
+        T = maxcut.gaintable(genomes(1)[0], p['CSR'])
+        self.assertGains(T, p)
+        for v in [3, 17, 3, 42, 0, 59]:
+            maxcut.gainflip(T, v)
+            self.assertGains(T, p)
+        v = maxcut.bestgain(T)
+        self.assertEqual(T['gain'][v], max(T['gain']))
+
+    def test_localsearch_reaches_a_local_optimum(self):
+        for tenure in [0, 5]:
+            p = maxcut.setlocalsearch(problem(), tenure)
+            x = genomes(1)[0]
+            y, fy = p['localsearch'](x, p['f'](x), [1, 2])
+            self.assertEqual(fy, maxcut.maxcut(y, p['W']))
+            if(tenure==0):
+                self.assertTrue(all(maxcut.maxcut(maxcut.flip(y, v), p['W']) <= fy for v in range(D)))
+
+    def test_localsearch_keeps_the_budget(self):
+        random.seed(4)
+        p = maxcut.HC(maxcut.setlocalsearch(problem(EVALS=500), 3))
+        core.run(p)
+        self.assertEqual(p['count'], 500)
+        self.assertEqual(p['best']['f'], maxcut.maxcut(p['best']['x'], p['W']))
+
+
+if __name__ == '__main__':
+    unittest.main()
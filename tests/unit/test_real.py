@@ -0,0 +1,67 @@
+import random
+import unittest
+
+import numpy as np
+
+from sgoal import core
+from sgoal import real
+
+FUNCTIONS = ['Sphere', 'Rastrigin', 'Schwefel', 'Griewank', 'Rosenbrock', 'Ackley']
+INCREMENTAL = ['Sphere', 'Rastrigin', 'Schwefel', 'Ackley']
+D = 10
+
+
+class TestPopVersions(unittest.TestCase):
+
+    def test_population_versions_match(self):
+        random.seed(1)
+        for name in FUNCTIONS:
+            problem = real.TestProblem(name, D, 10, BATCH=True)
+            P = problem['getN'](20)
+            np.testing.assert_allclose(problem['fbatch'](P), [problem['objective'](x) for x in P], rtol=1e-10, atol=1e-9)
+
+
+def run(algorithm, name, DELTA, seed=9):
+    random.seed(seed)
+    sgoal = algorithm(real.TestProblem(name, D, 2000, DELTA=DELTA))
+    core.run(sgoal)
+    return sgoal
+
+
+class TestIncremental(unittest.TestCase):
+
+    def test_incremental_mutation_matches_full_evaluation(self):
+        random.seed(2)
+        for name in INCREMENTAL:
+            problem = core.SPSGoal(real.TestProblem(name, D, 10000, DELTA=True))
+            f, variation = problem['objective'], real.gaussianvariation(problem)
+            x = problem['get']()
+            fx = f(x)
+            for i in range(500):
+                x, fx = variation(x, fx)
+                self.assertAlmostEqual(fx, f(x), delta=1e-7*max(1.0, abs(fx)))
+
+    def test_incremental_xover_matches_full_evaluation(self):
+        random.seed(3)
+        for name in INCREMENTAL:
+            problem = real.TestProblem(name, D, 10000, DELTA=True)
+            real.hypergaussianmutation(problem)
+            problem = core.SPSGoal(real.dxover(problem))
+            f = problem['objective']
+            for i in range(100):
+                x1, x2 = problem['get'](), problem['get']()
+                y1, fy1, y2, fy2 = problem['nextpair'](x1, f(x1), x2, f(x2), problem)
+                self.assertAlmostEqual(fy1, f(y1), delta=1e-7*max(1.0, abs(fy1)))
+                self.assertAlmostEqual(fy2, f(y2), delta=1e-7*max(1.0, abs(fy2)))
+
+    def test_incremental_runs_match_full_runs(self):
+        for algorithm in [real.HC, real.GGA]:
+            for name in INCREMENTAL:
+                a, b = run(algorithm, name, False), run(algorithm, name, True)
+                self.assertEqual(a['count'], b['count'])
+                self.assertAlmostEqual(a['best']['f'], b['best']['f'], delta=1e-7*max(1.0, abs(a['best']['f'])))
+                np.testing.assert_allclose(a['best']['x'], b['best']['x'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import random
+import unittest
+
+import numpy as np
+
+from sgoal import select
+
+
+def draw(mechanism, quality, N, s):
+    random.seed(s)
+    np.random.seed(s + 1)  # numpy's generator must not matter
+    return mechanism(quality, N)
+
+
+class TestVectorizedSelection(unittest.TestCase):
+
+    quality = [5.0, 1.0, 3.0, 2.0, 4.0, 0.5, 7.0, 2.5]
+
+    def test_reproducible_with_random_seed(self):
+        for mechanism in [select.min_vroulette, select.max_vroulette, select.min_vtournament(3), 
+                          select.max_vtournament(3), select.min_rank, select.max_rank, select.min_truncation(0.25)]:
+            a = draw(mechanism, self.quality, 50, 1)
+            np.random.seed(99)
+            b = draw(mechanism, self.quality, 50, 1)
+            self.assertEqual(a, b)
+            self.assertTrue(all(0 <= k < len(self.quality) for k in a))
+
+    def test_weightedrows_one_hot(self):
+        rates = np.eye(4)[[2, 0, 3, 1, 1]]
+        self.assertEqual(select.weightedrows(rates), [2, 0, 3, 1, 1])
+
+    def test_tournament_of_whole_population_picks_best(self):
+        random.seed(3)
+        # with a large tournament the best one is (almost surely) sampled
+        self.assertEqual(set(select.min_vtournament(200)(self.quality, 20)), {5})
+        self.assertEqual(set(select.max_vtournament(200)(self.quality, 20)), {6})
+
+    def test_truncation_picks_among_the_best(self):
+        random.seed(4)
+        self.assertTrue(set(select.min_truncation(0.25)(self.quality, 100)) <= {5, 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
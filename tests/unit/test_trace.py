@@ -0,0 +1,58 @@
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+from sgoal import core
+from sgoal import binary
+from sgoal import trace
+
+
+def run(TRACE, seed=6):
+    random.seed(seed)
+    problem = binary.TestProblem('MaxOnes', 40, 1000, TRACE=TRACE)
+    problem['optimum'] = None
+    sgoal = binary.RMHC(problem)
+    core.run(sgoal)
+    return sgoal
+
+
+class TestTraceSink(unittest.TestCase):
+
+    def test_sink_matches_in_memory_trace(self):
+        with tempfile.TemporaryDirectory() as dir:
+            memory = run(True)['trace']
+            run(trace.TRACESINK(dir, chunk=100))
+            stored = trace.loadtrace(dir)
+            self.assertEqual(stored['f'][0].tolist(), list(range(len(memory['f']))))
+            self.assertEqual(stored['f'][1].tolist(), memory['f'])
+            self.assertEqual(stored['best'][1].tolist(), memory['best'])
+
+    def test_downsampling_keeps_the_last_value(self):
+        with tempfile.TemporaryDirectory() as dir:
+            memory = run(True)['trace']
+            run(trace.TRACESINK(dir, evals=trace.every(10)))
+            index, values = trace.loadtrace(dir)['best']
+            n = len(memory['best'])
+            self.assertEqual(index.tolist(), list(range(0, n, 10)) + ([n-1] if (n-1) % 10 else []))
+            self.assertEqual(values.tolist(), [memory['best'][i] for i in index])
+
+    def test_reused_directory_starts_empty(self):
+        with tempfile.TemporaryDirectory() as dir:
+            run(trace.TRACESINK(dir, chunk=100))
+            random.seed(1)
+            problem = binary.TestProblem('MaxOnes', 40, 50, TRACE=trace.TRACESINK(dir, chunk=100))
+            problem['optimum'] = None
+            core.run(binary.RMHC(problem))
+            self.assertEqual(len(trace.loadtrace(dir)['f'][0]), 50)
+
+    def test_logspaced(self):
+        keep = trace.logspaced(10)
+        kept = [i for i in range(1000) if keep(i)]
+        self.assertEqual(kept[:13], list(range(11)) + [12, 15])
+        self.assertLess(len(kept), 40)
+
+
+if __name__ == '__main__':
+    unittest.main()
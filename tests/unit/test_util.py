@@ -0,0 +1,39 @@
+import random
+import unittest
+
+from sgoal import util
+from sgoal import binary
+
+
+class TestRandIndices(unittest.TestCase):
+
+    def test_indices_are_sorted_and_in_range(self):
+        random.seed(1)
+        for p in [0.01, 0.1, 0.5, 0.9]:
+            for i in range(100):
+                k = util.randindices(50, p)
+                self.assertEqual(k, sorted(set(k)))
+                self.assertTrue(all(0 <= i < 50 for i in k))
+
+    def test_limits(self):
+        self.assertEqual(util.randindices(10, 0), [])
+        self.assertEqual(util.randindices(10, 1), list(range(10)))
+
+    def test_each_index_has_probability_p(self):
+        random.seed(2)
+        n, p, R = 20, 0.1, 20000
+        count = [0]*n
+        for r in range(R):
+            for i in util.randindices(n, p): count[i] += 1
+        for c in count: self.assertAlmostEqual(c/R, p, delta=0.01)
+
+    def test_bitmutation_flips_the_drawn_indices(self):
+        random.seed(3)
+        x = [0]*100
+        y, k = binary.bitmutationflips(x, 0.05)
+        self.assertEqual([i for i in range(100) if y[i]==1], k)
+        self.assertEqual(x, [0]*100)
+
+
+if __name__ == '__main__':
+    unittest.main()